@@ -4,7 +4,11 @@ Interactive UI for improving user prompts using LLM-generated variations and met
 """
 
 import streamlit as st
+import pandas as pd
+import atexit
 import os
+import queue
+import threading
 from dotenv import load_dotenv
 from datetime import datetime
 
@@ -13,125 +17,159 @@ from src.prompt_optimizer import PromptOptimizer
 from src.response_generator import ResponseGenerator
 from src.evaluator import ResponseEvaluator
 from src.storage import ResultStorage
+from src.pipeline import OptimizationPipeline, PipelineProgress
 
 
 # Load environment variables
 load_dotenv()
 
 
+@st.cache_resource
 def initialize_system():
-    """Initialize all system components."""
-    try:
-        # Initialize Gemini client
-        api_key = os.getenv("GEMINI_API_KEY")
-        if not api_key:
-            st.error("⚠️ GEMINI_API_KEY not found. Please set it in your .env file.")
-            st.info("Get your free API key from: https://makersuite.google.com/app/apikey")
-            st.stop()
-        
-        client = GeminiClient(api_key)
-        optimizer = PromptOptimizer(client)
-        generator = ResponseGenerator(client)
-        evaluator = ResponseEvaluator()
-        storage = ResultStorage()
-        
-        return optimizer, generator, evaluator, storage
+    """
+    Initialize all system components.
+    Cached once per process so reruns reuse the same client and its connections.
+    Raises instead of calling st.error/st.stop so failures are never cached.
+    """
+    # Initialize Gemini client
+    api_key = os.getenv("GEMINI_API_KEY")
+    if not api_key:
+        raise ValueError("GEMINI_API_KEY not found. Please set it in your .env file.")
     
-    except Exception as e:
-        st.error(f"Error initializing system: {e}")
-        st.stop()
+    client = GeminiClient(api_key)
+    optimizer = PromptOptimizer(client)
+    generator = ResponseGenerator(client)
+    evaluator = ResponseEvaluator()
+    storage = ResultStorage()
+    
+    return OptimizationPipeline(optimizer, generator, evaluator), storage
+
+
+@st.cache_resource
+def _get_save_queue(_storage):
+    """
+    Start the background result writer once per process and return its queue.
+    Saving off the script thread lets results render without waiting on disk I/O.
+    """
+    save_queue = queue.Queue()
+    
+    def worker():
+        while True:
+            # Block for one result, then take everything else already queued
+            # so a burst of saves becomes a single append
+            results = [save_queue.get()]
+            while True:
+                try:
+                    results.append(save_queue.get_nowait())
+                except queue.Empty:
+                    break
+            try:
+                _storage.save_optimization_results(results)
+                _get_stats.clear()
+                print("✅ Successfully saved to storage")
+            except Exception as save_error:
+                print(f"❌ Error saving to storage: {save_error}")
+                import traceback
+                print(traceback.format_exc())
+            finally:
+                for _ in results:
+                    save_queue.task_done()
+    
+    threading.Thread(target=worker, daemon=True).start()
+    
+    # Flush pending writes before the process exits
+    atexit.register(save_queue.join)
+    
+    return save_queue
+
+
+@st.cache_data(ttl=5)
+def _get_stats(_storage, path, mtime):
+    """
+    Cached wrapper around storage.get_statistics().
+    The file's mtime is part of the cache key, so a new save invalidates it.
+    """
+    return _storage.get_statistics()
+
+
+def _load_stats(storage):
+    """Fetch sidebar statistics, re-reading the results file only when it changed."""
+    path = str(storage.results_file)
+    mtime = os.path.getmtime(path) if os.path.exists(path) else 0.0
+    return _get_stats(storage, path, mtime)
+
+
+class StreamlitProgress(PipelineProgress):
+    """Shows pipeline steps in an st.status container and streams responses into columns."""
+    
+    def __init__(self, status):
+        """
+        Initialize the progress display.
+        
+        Args:
+            status: st.status container that receives step updates
+        """
+        self.status = status
+        self.labels = []
+        self.placeholders = []
+    
+    def step(self, step, total, message):
+        self.status.update(label=f"🔄 Step {step}/{total}: {message}", state="running")
+    
+    def stream_started(self, labels):
+        self.labels = labels
+        self.placeholders = []
+        for col in st.columns(len(labels)):
+            with col:
+                self.placeholders.append(st.empty())
+    
+    def chunk(self, index, text):
+        self.placeholders[index].markdown(f"**{self.labels[index]}**\n\n{text}")
+    
+    def stream_finished(self):
+        for placeholder in self.placeholders:
+            placeholder.empty()
 
 
-def run_optimization_pipeline(user_prompt, task_type, optimizer, generator, evaluator, storage):
+def run_optimization_pipeline(user_prompt, task_type, pipeline, storage, mode="auto", use_cache=True):
     """
     Execute the complete optimization pipeline.
     
     Args:
         user_prompt: Original user prompt
         task_type: Selected task type
-        optimizer: PromptOptimizer instance
-        generator: ResponseGenerator instance
-        evaluator: ResponseEvaluator instance
+        pipeline: OptimizationPipeline instance
         storage: ResultStorage instance
+        mode: Model routing mode, "auto", "fast" or "best"
+        use_cache: False asks Gemini again instead of reusing cached results
         
     Returns:
         Dictionary with optimization results
     """
-    # Progress tracking
-    progress_bar = st.progress(0)
-    status_text = st.empty()
+    # One status container for all step updates (instead of a progress bar,
+    # a status line and a success message per step)
+    status = st.status("Optimizing...", expanded=False)
+    timestamp = datetime.now().isoformat()
     
     try:
-        # Step 1: Generate prompt variations
-        status_text.text("🔄 Step 1/4: Generating optimized prompt variations...")
-        progress_bar.progress(10)
+        results = pipeline.run(user_prompt, task_type, mode=mode, progress=StreamlitProgress(status),
+                               use_cache=use_cache)
         
-        variations = optimizer.generate_variations(user_prompt, task_type, num_variations=4)
-        
-        if not variations:
+        if results is None:
+            status.update(label="Failed to generate prompt variations", state="error")
             st.error("Failed to generate prompt variations. Please try again.")
             return None
         
-        st.success(f"✅ Generated {len(variations)} optimized prompts")
-        progress_bar.progress(25)
-        
-        # Step 2: Generate responses
-        status_text.text("🔄 Step 2/4: Generating responses for all prompts...")
-        
-        all_responses = generator.generate_all_responses(user_prompt, variations)
-        
-        st.success(f"✅ Generated {len(variations) + 1} responses")
-        progress_bar.progress(50)
-        
-        # Step 3: Evaluate all responses
-        status_text.text("🔄 Step 3/4: Evaluating responses using metric-based scoring...")
-        
-        evaluation_results = []
+        if results['skipped']:
+            st.info("✨ Your prompt is already well-structured, so no variations were needed.")
         
-        # Evaluate original
-        original_scores = evaluator.evaluate_response(
-            all_responses['original']['response'],
-            all_responses['original']['prompt'],
-            task_type
-        )
-        
-        evaluation_results.append({
-            'prompt': all_responses['original']['prompt'],
-            'response': all_responses['original']['response'],
-            'scores': original_scores,
-            'is_original': True
-        })
-        
-        # Evaluate all variations
-        for var_data in all_responses['variations']:
-            scores = evaluator.evaluate_response(
-                var_data['response'],
-                var_data['prompt'],
-                task_type
-            )
-            
-            evaluation_results.append({
-                'prompt': var_data['prompt'],
-                'response': var_data['response'],
-                'scores': scores,
-                'is_original': False
-            })
-        
-        st.success("✅ Evaluation complete")
-        progress_bar.progress(75)
-        
-        # Step 4: Select best prompt
-        status_text.text("🔄 Step 4/4: Selecting optimal prompt...")
-        
-        best_result = evaluator.compare_and_select_best(evaluation_results)
-        
-        progress_bar.progress(100)
-        status_text.text("✅ Optimization complete!")
+        best_result = results['best_result']
+        evaluation_results = results['evaluation_results']
         
         # Save result to storage
         try:
             result_to_save = {
-                'timestamp': datetime.now().isoformat(),
+                'timestamp': timestamp,
                 'task_type': task_type,
                 'original_prompt': user_prompt,
                 'optimized_prompt': best_result['best_prompt'],
@@ -139,27 +177,21 @@ def run_optimization_pipeline(user_prompt, task_type, optimizer, generator, eval
                 'optimized_score': best_result['best_scores']['total_score'],
                 'improvement': best_result['best_scores']['total_score'] - evaluation_results[0]['scores']['total_score']
             }
-            print(f"📝 Attempting to save: {result_to_save}")
-            print(f"📂 Storage object: {storage}")
-            print(f"📂 Storage file path: {storage.results_file}")
+            print(f"📝 Queueing save: {result_to_save}")
             
-            storage.save_optimization_result(result_to_save)
-            
-            print("✅ Successfully saved to storage")
-            st.info(f"💾 Saved to {storage.results_file}")
+            _get_save_queue(storage).put(result_to_save)
         except Exception as save_error:
             print(f"❌ Error saving to storage: {save_error}")
             import traceback
             print(traceback.format_exc())
             st.error(f"Could not save history: {save_error}")
         
-        return {
-            'best_result': best_result,
-            'evaluation_results': evaluation_results,
-            'variations': variations
-        }
+        status.update(label="✅ Optimization complete!", state="complete")
+        
+        return results
     
     except Exception as e:
+        status.update(label="Optimization failed", state="error")
         st.error(f"Error during optimization: {e}")
         import traceback
         st.code(traceback.format_exc())
@@ -181,14 +213,20 @@ def display_results(results):
     optimized_score = best['best_scores']['total_score']
     improvement = optimized_score - original_score
     
-    col1, col2, col3 = st.columns(3)
-    with col1:
-        st.metric("Original Score", f"{original_score:.1f}/100")
-    with col2:
-        st.metric("Optimized Score", f"{optimized_score:.1f}/100", f"+{improvement:.1f}")
-    with col3:
-        improvement_pct = (improvement / original_score * 100) if original_score > 0 else 0
-        st.metric("Improvement", f"{improvement_pct:.1f}%")
+    improvement_pct = (improvement / original_score * 100) if original_score > 0 else 0
+    
+    # One HTML block instead of three columns of st.metric widgets
+    summary_cells = "".join(
+        f"<div style='flex: 1;'><p style='margin: 0; font-size: 0.9rem;'>{label}</p>"
+        f"<p style='margin: 0; font-size: 2rem;'>{value}</p>{delta}</div>"
+        for label, value, delta in [
+            ("Original Score", f"{original_score:.1f}/100", ""),
+            ("Optimized Score", f"{optimized_score:.1f}/100",
+             f"<p style='margin: 0; color: #2e9e5b !important;'>+{improvement:.1f}</p>"),
+            ("Improvement", f"{improvement_pct:.1f}%", "")
+        ]
+    )
+    st.markdown(f"<div style='display: flex; gap: 1rem;'>{summary_cells}</div>", unsafe_allow_html=True)
     
     st.markdown("")
     
@@ -219,13 +257,39 @@ def display_results(results):
     with st.expander("View Score Details"):
         scores = best['best_scores']
         
-        col1, col2 = st.columns(2)
-        with col1:
-            st.metric("Length & Completeness", f"{scores['length_score']:.1f}/25")
-            st.metric("Keyword Relevance", f"{scores['keyword_score']:.1f}/25")
-        with col2:
-            st.metric("Structure & Formatting", f"{scores['structure_score']:.1f}/25")
-            st.metric("Prompt Alignment", f"{scores['alignment_score']:.1f}/25")
+        score_table = pd.DataFrame({
+            "Metric": ["Length & Completeness", "Keyword Relevance",
+                       "Structure & Formatting", "Prompt Alignment"],
+            "Score": [f"{scores[key]:.1f}/25" for key in
+                      ("length_score", "keyword_score", "structure_score", "alignment_score")]
+        })
+        st.dataframe(score_table, hide_index=True, use_container_width=True)
+
+
+def _sidebar_stats(storage):
+    """Render the sidebar statistics and the Clear History button."""
+    st.markdown("### Your Stats")
+    
+    stats = _load_stats(storage)
+    
+    if stats['total_optimizations'] > 0:
+        st.metric("Prompts Improved", stats['total_optimizations'])
+        st.metric("Average Boost", f"+{stats['average_improvement']:.1f} pts")
+        
+        if stats['task_type_counts']:
+            st.markdown("")
+            st.markdown("**By Task Type:**")
+            for task, count in stats['task_type_counts'].items():
+                st.caption(f"• {task}: {count}")
+    else:
+        st.caption("No optimizations yet")
+    
+    st.markdown("")
+    if st.button("Clear History", use_container_width=True):
+        storage.clear_results()
+        _get_stats.clear()
+        st.success("History cleared")
+        st.rerun()
 
 
 def main():
@@ -330,32 +394,29 @@ def main():
     """, unsafe_allow_html=True)
     
     # Initialize system components
-    optimizer, generator, evaluator, storage = initialize_system()
+    try:
+        pipeline, storage = initialize_system()
+    except ValueError as e:
+        st.error(f"⚠️ {e}")
+        st.info("Get your free API key from: https://makersuite.google.com/app/apikey")
+        st.stop()
+    except Exception as e:
+        st.error(f"Error initializing system: {e}")
+        st.stop()
     
     # Sidebar - functional elements only
     with st.sidebar:
-        st.markdown("### Your Stats")
-        
-        stats = storage.get_statistics()
-        
-        if stats['total_optimizations'] > 0:
-            st.metric("Prompts Improved", stats['total_optimizations'])
-            st.metric("Average Boost", f"+{stats['average_improvement']:.1f} pts")
-            
-            if stats['task_type_counts']:
-                st.markdown("")
-                st.markdown("**By Task Type:**")
-                for task, count in stats['task_type_counts'].items():
-                    st.caption(f"• {task}: {count}")
-        else:
-            st.caption("No optimizations yet")
+        _sidebar_stats(storage)
         
         st.markdown("")
-        st.markdown("")
-        if st.button("Clear History", use_container_width=True):
-            storage.clear_results()
-            st.success("History cleared")
-            st.rerun()
+        st.markdown("**Model:**")
+        model_mode = st.radio(
+            "Model",
+            options=["Auto", "Fast", "Best"],
+            horizontal=True,
+            help="Auto picks a faster model for short, simple questions",
+            label_visibility="collapsed"
+        )
     
     # Main input section
     col1, col2 = st.columns([3, 2])
@@ -391,6 +452,10 @@ def main():
             type="primary", 
             use_container_width=True
         )
+        regenerate = st.checkbox(
+            "🔄 Regenerate",
+            help="Ignore cached variations and responses and ask Gemini for fresh ones"
+        )
     
     # Run optimization when button is clicked
     if optimize_button:
@@ -402,16 +467,17 @@ def main():
                 results = run_optimization_pipeline(
                     user_prompt.strip(),
                     task_type,
-                    optimizer,
-                    generator,
-                    evaluator,
-                    storage
+                    pipeline,
+                    storage,
+                    mode=model_mode.lower(),
+                    use_cache=not regenerate
                 )
                 
                 # Display results
                 if results:
                     display_results(results)
-                    st.success("✅ Saved to history!")
+                    # The save itself happens on the background writer
+                    st.success("✅ Queued for history")
                 else:
                     st.error("Optimization failed. Check the console for errors.")
     
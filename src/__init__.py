@@ -2,6 +2,6 @@
 Package initialization for the prompt optimization system.
 """
 
-from .gemini_client import GeminiClient
+from .gemini_client import GeminiClient, get_default_client
 
-__all__ = ['GeminiClient']
+__all__ = ['GeminiClient', 'get_default_client']
@@ -5,7 +5,70 @@ NO subjective LLM self-evaluation - only fixed, measurable criteria.
 """
 
 import re
-from typing import Dict, List
+from functools import lru_cache
+from itertools import islice
+from typing import Dict, FrozenSet, List, Optional, Tuple
+
+try:
+    import ahocorasick
+except ImportError:  # Falls back to one substring check per keyword
+    ahocorasick = None
+
+
+# Precompiled patterns used on every evaluation
+_SENTENCE_SPLIT = re.compile(r'[.!?]+')
+_LIST_MARKER = re.compile(r'(\n\s*[-*•]\s+|\n\s*\d+\.\s+)')
+_WORD_RE = re.compile(r'\b\w+\b')
+
+# Words ignored when measuring prompt alignment
+_STOP_WORDS = frozenset({
+    'a', 'an', 'the', 'is', 'are', 'was', 'were', 'be', 'been', 'being',
+    'have', 'has', 'had', 'do', 'does', 'did', 'will', 'would', 'should',
+    'could', 'can', 'may', 'might', 'must', 'to', 'of', 'in', 'on', 'at',
+    'for', 'with', 'about', 'as', 'by', 'from', 'and', 'or', 'but', 'not',
+    'please', 'provide', 'explain', 'describe', 'write', 'generate', 'create'
+})
+
+# Optimal response word count ranges for each task type
+_OPTIMAL_RANGES = {
+    "Question Answering": (30, 200),
+    "Summarization": (50, 150),
+    "Explanation": (100, 300),
+    "Code Generation": (50, 400)
+}
+
+# Human-readable metric names, in scoring order
+_METRIC_NAMES = {
+    'length_score': 'response completeness',
+    'keyword_score': 'task-relevant keywords',
+    'structure_score': 'structure and formatting',
+    'alignment_score': 'prompt alignment'
+}
+
+# Prompts with more meaningful words than this are matched with a one-off
+# automaton; below it, building the automaton costs more than it saves
+_AUTOMATON_MIN_PROMPT_WORDS = 20
+
+
+def _build_automaton(words) -> "ahocorasick.Automaton":
+    """Build an Aho-Corasick automaton that reports each matched word."""
+    automaton = ahocorasick.Automaton()
+    for word in words:
+        automaton.add_word(word, word)
+    automaton.make_automaton()
+    return automaton
+
+
+def _count_present(words, text: str, automaton=None) -> int:
+    """
+    Count how many of `words` occur as substrings of `text`.
+    
+    With an automaton this is one linear scan over the text instead of one
+    substring search per word; both report exactly the same words.
+    """
+    if automaton is not None:
+        return len({word for _, word in automaton.iter(text)})
+    return sum(1 for word in words if word in text)
 
 
 class ResponseEvaluator:
@@ -19,32 +82,48 @@ class ResponseEvaluator:
         
         # Task-specific quality indicators - STRICT criteria for high scores
         self.task_keywords = {
-            "Question Answering": [
+            "Question Answering": (
                 "specifically", "exactly", "precisely", "clearly",
                 "therefore", "because", "consequently", "thus",
                 "evidence", "fact", "research", "study",
                 "conclusion", "result", "finding"
-            ],
-            "Summarization": [
+            ),
+            "Summarization": (
                 "summary", "overview", "summarize", "summarizing",
                 "key points", "main points", "highlights",
                 "primarily", "essentially", "fundamentally",
                 "in brief", "in short", "overall"
-            ],
-            "Explanation": [
+            ),
+            "Explanation": (
                 "first", "second", "third", "finally",
                 "step-by-step", "process", "procedure",
                 "example", "instance", "illustration",
                 "understand", "comprehend", "grasp",
                 "concept", "principle", "mechanism"
-            ],
-            "Code Generation": [
+            ),
+            "Code Generation": (
                 "function", "class", "def", "return", "import",
                 "parameter", "argument", "variable",
                 "loop", "iterate", "recursion",
                 "exception", "error handling", "validation"
-            ]
+            )
+        }
+        
+        # Frozen keyword sets per task type, built once instead of per call
+        self._keyword_sets = {
+            task_type: frozenset(keywords)
+            for task_type, keywords in self.task_keywords.items()
         }
+        
+        # One multi-pattern matcher per task type when pyahocorasick is installed
+        self._keyword_automata = {
+            task_type: _build_automaton(keywords)
+            for task_type, keywords in self._keyword_sets.items()
+        } if ahocorasick is not None else {}
+        
+        # Prompt preprocessing depends only on the prompt, and the same prompt
+        # is often scored against several responses
+        self._prompt_features = lru_cache(maxsize=256)(self._compute_prompt_features)
     
     def evaluate_response(self, response: str, prompt: str, task_type: str) -> Dict[str, float]:
         """
@@ -60,17 +139,22 @@ class ResponseEvaluator:
         """
         scores = {}
         
+        # Derive shared text views once and hand them to every metric
+        response_lower = response.lower()
+        word_count = len(response.split())
+        prompt_words, prompt_automaton = self._prompt_features(prompt)
+        
         # Metric 1: Length and completeness (0-25 points)
-        scores['length_score'] = self._score_length(response, task_type)
+        scores['length_score'] = self._score_length(word_count, task_type)
         
         # Metric 2: Keyword relevance (0-25 points)
-        scores['keyword_score'] = self._score_keywords(response, task_type)
+        scores['keyword_score'] = self._score_keywords(response_lower, task_type)
         
         # Metric 3: Structure and formatting (0-25 points)
         scores['structure_score'] = self._score_structure(response, task_type)
         
         # Metric 4: Prompt alignment (0-25 points)
-        scores['alignment_score'] = self._score_prompt_alignment(response, prompt)
+        scores['alignment_score'] = self._score_prompt_alignment(response_lower, prompt_words, prompt_automaton)
         
         # Calculate total score (0-100)
         scores['total_score'] = sum([
@@ -82,29 +166,36 @@ class ResponseEvaluator:
         
         return scores
     
-    def _score_length(self, response: str, task_type: str) -> float:
+    def evaluate_many(self, items: List[Dict]) -> List[Dict[str, float]]:
+        """
+        Evaluate several responses in order.
+        Scoring is pure Python and holds the GIL, so this is a plain loop;
+        a thread pool measured slower at every response size tried.
+        
+        Args:
+            items: Dicts with 'response', 'prompt' and 'task_type' keys
+            
+        Returns:
+            Score dictionaries (see evaluate_response), in input order
+        """
+        return [
+            self.evaluate_response(item['response'], item['prompt'], item['task_type'])
+            for item in items
+        ]
+    
+    def _score_length(self, word_count: int, task_type: str) -> float:
         """
         Score based on response length appropriateness.
         Different tasks have different optimal length ranges.
         
         Args:
-            response: Response text
+            word_count: Number of whitespace-separated words in the response
             task_type: Task type
             
         Returns:
             Score from 0-25
         """
-        word_count = len(response.split())
-        
-        # Define optimal word count ranges for each task type
-        optimal_ranges = {
-            "Question Answering": (30, 200),
-            "Summarization": (50, 150),
-            "Explanation": (100, 300),
-            "Code Generation": (50, 400)
-        }
-        
-        min_words, max_words = optimal_ranges.get(task_type, (50, 200))
+        min_words, max_words = _OPTIMAL_RANGES.get(task_type, (50, 200))
         
         if word_count < min_words * 0.5:
             # Way too short - very low score
@@ -125,26 +216,24 @@ class ResponseEvaluator:
             # Too verbose
             return 12.0
     
-    def _score_keywords(self, response: str, task_type: str) -> float:
+    def _score_keywords(self, response_lower: str, task_type: str) -> float:
         """
         Score based on presence of task-relevant keywords.
         
         Args:
-            response: Response text
+            response_lower: Lowercased response text
             task_type: Task type
             
         Returns:
             Score from 0-25
         """
-        keywords = self.task_keywords.get(task_type, [])
+        keywords = self._keyword_sets.get(task_type, frozenset())
         
         if not keywords:
             return 15.0  # Neutral score if no keywords defined
         
-        response_lower = response.lower()
-        
         # Count how many keywords appear
-        keyword_count = sum(1 for kw in keywords if kw in response_lower)
+        keyword_count = _count_present(keywords, response_lower, self._keyword_automata.get(task_type))
         
         # Calculate percentage of keywords present
         keyword_percentage = keyword_count / len(keywords)
@@ -168,10 +257,11 @@ class ResponseEvaluator:
         score = 0.0
         
         # Check for proper sentence structure (sentences end with punctuation)
-        sentences = re.split(r'[.!?]+', response)
-        valid_sentences = [s for s in sentences if s.strip() and len(s.split()) > 3]
+        # Only two well-formed sentences are needed, so stop scanning once found
+        sentences = _SENTENCE_SPLIT.split(response)
+        valid_sentences = (s for s in sentences if s.strip() and len(s.split()) > 3)
         
-        if len(valid_sentences) >= 2:
+        if len(list(islice(valid_sentences, 2))) >= 2:
             score += 8.0
         
         # Check for paragraphs or line breaks (indicates organization)
@@ -180,7 +270,7 @@ class ResponseEvaluator:
             score += 5.0
         
         # Check for lists or bullet points (good for structured info)
-        if re.search(r'(\n\s*[-*•]\s+|\n\s*\d+\.\s+)', response):
+        if _LIST_MARKER.search(response):
             score += 5.0
         
         # Check for code blocks (important for code generation)
@@ -194,37 +284,68 @@ class ResponseEvaluator:
         
         return min(score, 25.0)
     
-    def _score_prompt_alignment(self, response: str, prompt: str) -> float:
+    def _compute_prompt_features(self, prompt: str) -> Tuple[FrozenSet[str], Optional["ahocorasick.Automaton"]]:
         """
-        Score based on how well the response aligns with the prompt.
-        Measures keyword overlap between prompt and response.
+        Preprocess a prompt for alignment scoring (memoized as _prompt_features).
         
         Args:
-            response: Response text
-            prompt: Original prompt
+            prompt: Prompt text
             
         Returns:
-            Score from 0-25
+            Tuple of the meaningful prompt words and, for long prompts when
+            pyahocorasick is installed, an automaton over them (else None)
         """
-        # Extract meaningful words from prompt (remove stop words)
-        stop_words = {
-            'a', 'an', 'the', 'is', 'are', 'was', 'were', 'be', 'been', 'being',
-            'have', 'has', 'had', 'do', 'does', 'did', 'will', 'would', 'should',
-            'could', 'can', 'may', 'might', 'must', 'to', 'of', 'in', 'on', 'at',
-            'for', 'with', 'about', 'as', 'by', 'from', 'and', 'or', 'but', 'not',
-            'please', 'provide', 'explain', 'describe', 'write', 'generate', 'create'
-        }
+        prompt_words = self._extract_prompt_words(prompt)
         
-        prompt_words = set(
-            word.lower() 
-            for word in re.findall(r'\b\w+\b', prompt)
-            if word.lower() not in stop_words and len(word) > 2
-        )
+        automaton = None
+        if ahocorasick is not None and len(prompt_words) > _AUTOMATON_MIN_PROMPT_WORDS:
+            automaton = _build_automaton(prompt_words)
         
-        response_lower = response.lower()
+        return prompt_words, automaton
+    
+    def _extract_prompt_words(self, prompt: str) -> FrozenSet[str]:
+        """
+        Extract meaningful words from a prompt (stop words removed).
+        
+        Args:
+            prompt: Prompt text
+            
+        Returns:
+            Frozen set of lowercased prompt words
+        """
+        # ASCII lowercasing never changes word boundaries or lengths, so the
+        # whole prompt can be lowered in one call
+        if prompt.isascii():
+            return frozenset(
+                word for word in _WORD_RE.findall(prompt.lower())
+                if len(word) > 2 and word not in _STOP_WORDS
+            )
+        
+        # Otherwise lowercase each word once; the length check stays on the original word
+        prompt_words = set()
+        for word in _WORD_RE.findall(prompt):
+            if len(word) > 2:
+                lowered = word.lower()
+                if lowered not in _STOP_WORDS:
+                    prompt_words.add(lowered)
+        return frozenset(prompt_words)
+    
+    def _score_prompt_alignment(self, response_lower: str, prompt_words: FrozenSet[str],
+                                automaton=None) -> float:
+        """
+        Score based on how well the response aligns with the prompt.
+        Measures keyword overlap between prompt and response.
         
+        Args:
+            response_lower: Lowercased response text
+            prompt_words: Meaningful prompt words (see _extract_prompt_words)
+            automaton: Optional automaton over prompt_words (see _compute_prompt_features)
+            
+        Returns:
+            Score from 0-25
+        """
         # Count how many prompt words appear in response
-        matching_words = sum(1 for word in prompt_words if word in response_lower)
+        matching_words = _count_present(prompt_words, response_lower, automaton)
         
         if not prompt_words or len(prompt_words) < 2:
             # Very short prompts get low base score
@@ -263,8 +384,16 @@ class ResponseEvaluator:
         if not evaluation_results:
             raise ValueError("No evaluation results to compare")
         
-        # Find the result with the highest total score
-        best_result = max(evaluation_results, key=lambda x: x['scores']['total_score'])
+        # Find the highest total score (first one wins ties) and collect all
+        # scores in the same pass
+        best_idx, best_score = 0, float('-inf')
+        all_scores = []
+        for idx, result in enumerate(evaluation_results):
+            score = result['scores']['total_score']
+            all_scores.append(score)
+            if score > best_score:
+                best_idx, best_score = idx, score
+        best_result = evaluation_results[best_idx]
         
         # Create explanation of why this prompt won
         explanation = self._generate_explanation(best_result, evaluation_results)
@@ -274,7 +403,7 @@ class ResponseEvaluator:
             'best_response': best_result['response'],
             'best_scores': best_result['scores'],
             'explanation': explanation,
-            'all_scores': [r['scores']['total_score'] for r in evaluation_results]
+            'all_scores': all_scores
         }
     
     def _generate_explanation(self, best_result: Dict, all_results: List[Dict]) -> str:
@@ -291,17 +420,7 @@ class ResponseEvaluator:
         best_scores = best_result['scores']
         
         # Identify the strongest metric
-        metric_names = {
-            'length_score': 'response completeness',
-            'keyword_score': 'task-relevant keywords',
-            'structure_score': 'structure and formatting',
-            'alignment_score': 'prompt alignment'
-        }
-        
-        strongest_metric = max(
-            ['length_score', 'keyword_score', 'structure_score', 'alignment_score'],
-            key=lambda m: best_scores[m]
-        )
+        strongest_metric = max(_METRIC_NAMES, key=lambda m: best_scores[m])
         
         explanation_parts = []
         
@@ -310,7 +429,7 @@ class ResponseEvaluator:
         )
         
         explanation_parts.append(
-            f"It excelled particularly in {metric_names[strongest_metric]} "
+            f"It excelled particularly in {_METRIC_NAMES[strongest_metric]} "
             f"({best_scores[strongest_metric]:.1f}/25)."
         )
         
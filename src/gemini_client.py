@@ -3,14 +3,107 @@ Gemini API Client Module
 Handles all interactions with Google's Gemini API.
 """
 
+import asyncio
+import json
 import os
+import random
+import threading
+import time
 import google.generativeai as genai
-from typing import Optional
+from google.api_core import exceptions as api_exceptions
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import AsyncIterator, Coroutine, Iterator, Optional
+
+from .llm_cache import ExactCache, get_semantic_cache
+
+
+# Shared event loop for async API calls. The SDK's async client binds to the
+# loop it was first used on, so every coroutine must run on this same loop
+# instead of a fresh asyncio.run() per call.
+_loop: Optional[asyncio.AbstractEventLoop] = None
+_loop_lock = threading.Lock()
+
+# Upper bounds on parallel requests (threads for generate_text_batch, in-flight
+# coroutines for the async methods), to stay within Gemini's per-minute quota
+MAX_CONCURRENCY = 8
+MAX_ASYNC_CONCURRENCY = 16
+
+# Transient failures worth retrying: rate limits and server-side errors
+_RETRYABLE_ERRORS = (
+    api_exceptions.TooManyRequests,
+    api_exceptions.ResourceExhausted,
+    api_exceptions.InternalServerError,
+    api_exceptions.ServiceUnavailable,
+    api_exceptions.DeadlineExceeded,
+)
+
+# API key the SDK was last configured with. genai.configure() drops the SDK's
+# cached service clients (and their open HTTP/2 channels), so it is only
+# called again when the key actually changes.
+_configured_key: Optional[str] = None
+_configure_lock = threading.Lock()
+
+
+def submit_async(coro: Coroutine) -> Future:
+    """
+    Schedule a coroutine on the shared background event loop without waiting.
+    
+    Args:
+        coro: Coroutine to execute
+        
+    Returns:
+        concurrent.futures.Future resolving to the coroutine's result
+    """
+    global _loop
+    with _loop_lock:
+        if _loop is None:
+            _loop = asyncio.new_event_loop()
+            threading.Thread(target=_loop.run_forever, daemon=True).start()
+    return asyncio.run_coroutine_threadsafe(coro, _loop)
+
+
+def run_async(coro: Coroutine):
+    """
+    Run a coroutine on the shared background event loop and wait for it.
+    
+    Args:
+        coro: Coroutine to execute
+        
+    Returns:
+        The coroutine's result
+    """
+    return submit_async(coro).result()
 
 
 class GeminiClient:
     """Client for interacting with Google's Gemini API."""
     
+    # Model tiers used for routing (see select_model)
+    MODELS = {
+        "fast": "models/gemini-2.5-flash-lite",
+        "default": "models/gemini-2.5-flash",
+        "best": "models/gemini-2.5-pro"
+    }
+    
+    # Prompts below this word count, for these task types, are routed to the fast tier
+    SIMPLE_PROMPT_WORDS = 20
+    SIMPLE_TASK_TYPES = {"Question Answering"}
+    
+    # Only near-deterministic calls are cached by default; at higher
+    # temperatures a cache would freeze one random sample
+    CACHE_MAX_TEMPERATURE = 0.3
+    CACHE_MEMORY_SIZE = 1024
+    
+    # Retry transient errors with jittered exponential backoff (1s, 2s, 4s, ... capped at 30s)
+    RETRY_ATTEMPTS = 5
+    RETRY_INITIAL_DELAY = 1.0
+    RETRY_MAX_DELAY = 30.0
+    
+    # Reworded prompts above this cosine similarity reuse a cached response
+    # (only when sentence-transformers is installed, and below 0.5 temperature)
+    SEMANTIC_THRESHOLD = 0.92
+    SEMANTIC_MAX_TEMPERATURE = 0.5
+    
     def __init__(self, api_key: Optional[str] = None):
         """
         Initialize the Gemini client.
@@ -25,13 +118,61 @@ class GeminiClient:
                 "GEMINI_API_KEY not found. Please set it in your .env file or pass it directly."
             )
         
-        # Configure the API
-        genai.configure(api_key=self.api_key)
+        # Configure the API once per key; the SDK then reuses one gRPC
+        # (HTTP/2) channel per service client for every request in the process
+        global _configured_key
+        with _configure_lock:
+            if _configured_key != self.api_key:
+                genai.configure(api_key=self.api_key)
+                _configured_key = self.api_key
         
-        # Use gemini-2.5-flash (latest free tier model)
-        self.model = genai.GenerativeModel('models/gemini-2.5-flash')
+        # Model instances are created on first use and reused afterwards
+        self._models = {}
+        
+        # Gates every async request; created here because all of them run on
+        # the one shared event loop
+        self._async_slots = asyncio.Semaphore(MAX_ASYNC_CONCURRENCY)
+        
+        # Prompt -> response cache (memory LRU in front of .cache/text on disk),
+        # with a similarity fallback for near-duplicate prompts
+        self._text_cache = ExactCache("text", memory_size=self.CACHE_MEMORY_SIZE)
+        self._semantic_cache = get_semantic_cache("text", threshold=self.SEMANTIC_THRESHOLD)
+        
+        # Use gemini-2.5-flash (latest free tier model) by default
+        self.model = self._get_model(self.MODELS["default"])
     
-    def generate_text(self, prompt: str, temperature: float = 0.7, max_tokens: int = 1024) -> str:
+    def select_model(self, prompt: str, task_type: Optional[str] = None, mode: str = "auto") -> str:
+        """
+        Pick a model tier for a prompt.
+        
+        Args:
+            prompt: The prompt that drives the request
+            task_type: Type of task, if known
+            mode: "auto" (route by complexity), "fast", or "best"
+            
+        Returns:
+            Model name to pass to the generate methods
+        """
+        if mode in ("fast", "best"):
+            return self.MODELS[mode]
+        
+        # Short, simple questions don't need the larger model
+        if len(prompt.split()) < self.SIMPLE_PROMPT_WORDS and task_type in self.SIMPLE_TASK_TYPES:
+            return self.MODELS["fast"]
+        
+        return self.MODELS["default"]
+    
+    def _get_model(self, model_name: Optional[str] = None) -> genai.GenerativeModel:
+        """Return the (cached) model instance for model_name, or the default model."""
+        if model_name is None:
+            return self.model
+        if model_name not in self._models:
+            self._models[model_name] = genai.GenerativeModel(model_name)
+        return self._models[model_name]
+    
+    def generate_text(self, prompt: str, temperature: float = 0.7, max_tokens: int = 1024,
+                      model: Optional[str] = None, use_cache: bool = True,
+                      cache_force: bool = False) -> str:
         """
         Generate text using Gemini API.
         
@@ -39,50 +180,269 @@ class GeminiClient:
             prompt: The input prompt
             temperature: Sampling temperature (0.0 to 1.0)
             max_tokens: Maximum number of tokens to generate
+            model: Model name (see select_model); defaults to the client's model
+            use_cache: Serve repeated calls from the prompt cache
+            cache_force: Cache even above CACHE_MAX_TEMPERATURE
             
         Returns:
             Generated text response
         """
+        cache_key = self._cache_key(prompt, temperature, max_tokens, model, use_cache, cache_force)
+        cached = self._cache_get(prompt, cache_key, temperature)
+        if cached is not None:
+            return cached
+        
         try:
-            generation_config = genai.types.GenerationConfig(
-                temperature=temperature,
-                max_output_tokens=max_tokens,
-            )
+            response = self._call_with_retry(lambda: self._get_model(model).generate_content(
+                prompt,
+                generation_config=self._generation_config(temperature, max_tokens)
+            ))
+            text = response.text
+        
+        except Exception as e:
+            raise self._translate_error(e)
+        
+        self._cache_set(prompt, cache_key, temperature, text)
+        
+        return text
+    
+    def generate_text_stream(self, prompt: str, temperature: float = 0.7, max_tokens: int = 1024,
+                             model: Optional[str] = None) -> Iterator[str]:
+        """
+        Stream generated text chunk by chunk, so callers can show output
+        before the full completion has arrived.
+        
+        Args:
+            prompt: The input prompt
+            temperature: Sampling temperature (0.0 to 1.0)
+            max_tokens: Maximum number of tokens to generate
+            model: Model name (see select_model); defaults to the client's model
             
-            response = self.model.generate_content(
+        Yields:
+            Text chunks in generation order
+        """
+        try:
+            # Errors surface when the stream is opened, before any chunk has
+            # been yielded, so only the open call is retried
+            response = self._call_with_retry(lambda: self._get_model(model).generate_content(
                 prompt,
-                generation_config=generation_config
-            )
+                generation_config=self._generation_config(temperature, max_tokens),
+                stream=True
+            ))
             
-            return response.text
+            for chunk in response:
+                yield chunk.text
         
         except Exception as e:
-            error_msg = str(e).lower()
-            if "connection" in error_msg or "network" in error_msg:
-                raise ConnectionError(f"🌐 Network error: Cannot connect to Gemini API. Check your internet connection.")
-            elif "api key" in error_msg or "authentication" in error_msg or "401" in error_msg:
-                raise ValueError(f"🔑 API Key error: Invalid or expired API key. Get a new one from https://makersuite.google.com/app/apikey")
-            elif "rate limit" in error_msg or "429" in error_msg or "quota" in error_msg:
-                raise ConnectionError(f"⏱️ Rate limit: Too many requests. Wait a moment and try again.")
-            else:
-                print(f"Error generating text: {e}")
-                raise Exception(f"API Error: {e}")
-    
-    def generate_text_batch(self, prompts: list[str], temperature: float = 0.7, max_tokens: int = 1024) -> list[str]:
+            raise self._translate_error(e)
+    
+    async def agenerate_text(self, prompt: str, temperature: float = 0.7, max_tokens: int = 1024,
+                             model: Optional[str] = None, use_cache: bool = True,
+                             cache_force: bool = False) -> str:
+        """
+        Generate text using the async Gemini API.
+        
+        Args:
+            prompt: The input prompt
+            temperature: Sampling temperature (0.0 to 1.0)
+            max_tokens: Maximum number of tokens to generate
+            model: Model name (see select_model); defaults to the client's model
+            use_cache: Serve repeated calls from the prompt cache
+            cache_force: Cache even above CACHE_MAX_TEMPERATURE
+            
+        Returns:
+            Generated text response
+        """
+        cache_key = self._cache_key(prompt, temperature, max_tokens, model, use_cache, cache_force)
+        cached = self._cache_get(prompt, cache_key, temperature)
+        if cached is not None:
+            return cached
+        
+        async def request():
+            # Hold a concurrency slot only while the request is in flight,
+            # not while backing off
+            async with self._async_slots:
+                return await self._get_model(model).generate_content_async(
+                    prompt,
+                    generation_config=self._generation_config(temperature, max_tokens)
+                )
+        
+        try:
+            response = await self._acall_with_retry(request)
+            text = response.text
+        
+        except Exception as e:
+            raise self._translate_error(e)
+        
+        self._cache_set(prompt, cache_key, temperature, text)
+        
+        return text
+    
+    def _retry_delay(self, attempt: int) -> float:
+        """Backoff before retry number `attempt` (0-based), with up to 1s of jitter."""
+        return min(self.RETRY_MAX_DELAY, self.RETRY_INITIAL_DELAY * 2 ** attempt) + random.uniform(0, 1)
+    
+    def _call_with_retry(self, call):
+        """Run call(), retrying rate-limit and server errors with backoff."""
+        for attempt in range(self.RETRY_ATTEMPTS):
+            try:
+                return call()
+            except _RETRYABLE_ERRORS as e:
+                if attempt == self.RETRY_ATTEMPTS - 1:
+                    raise
+                delay = self._retry_delay(attempt)
+                print(f"⏳ Gemini busy ({type(e).__name__}), retrying in {delay:.1f}s...")
+                time.sleep(delay)
+    
+    async def _acall_with_retry(self, call):
+        """Async version of _call_with_retry; call() must return a new coroutine each time."""
+        for attempt in range(self.RETRY_ATTEMPTS):
+            try:
+                return await call()
+            except _RETRYABLE_ERRORS as e:
+                if attempt == self.RETRY_ATTEMPTS - 1:
+                    raise
+                delay = self._retry_delay(attempt)
+                print(f"⏳ Gemini busy ({type(e).__name__}), retrying in {delay:.1f}s...")
+                await asyncio.sleep(delay)
+    
+    def _cache_key(self, prompt: str, temperature: float, max_tokens: int, model: Optional[str],
+                   use_cache: bool, cache_force: bool) -> Optional[str]:
+        """Return the prompt-cache key for a call, or None if it should not be cached."""
+        if not use_cache or (temperature > self.CACHE_MAX_TEMPERATURE and not cache_force):
+            return None
+        return json.dumps([self._get_model(model).model_name, temperature, max_tokens, prompt])
+    
+    def _semantic_scope(self, cache_key: str, temperature: float) -> Optional[str]:
+        """Similarity matches only count within the same model and settings."""
+        if temperature >= self.SEMANTIC_MAX_TEMPERATURE or not self._semantic_cache.enabled:
+            return None
+        return json.dumps(json.loads(cache_key)[:-1])
+    
+    def _cache_get(self, prompt: str, cache_key: Optional[str], temperature: float) -> Optional[str]:
+        """Look up the exact cache, then the similarity cache."""
+        if cache_key is None:
+            return None
+        
+        cached = self._text_cache.get(cache_key)
+        if cached is None:
+            scope = self._semantic_scope(cache_key, temperature)
+            if scope is not None:
+                cached = self._semantic_cache.get(prompt, scope)
+        return cached
+    
+    def _cache_set(self, prompt: str, cache_key: Optional[str], temperature: float, text: str) -> None:
+        """Store a fresh response in both cache tiers."""
+        if cache_key is None or not text:
+            return
+        
+        self._text_cache.set(cache_key, text)
+        scope = self._semantic_scope(cache_key, temperature)
+        if scope is not None:
+            self._semantic_cache.set(prompt, text, scope)
+    
+    async def astream_text(self, prompt: str, temperature: float = 0.7, max_tokens: int = 1024,
+                           model: Optional[str] = None) -> AsyncIterator[str]:
+        """
+        Stream generated text chunk by chunk as Gemini produces it.
+        
+        Args:
+            prompt: The input prompt
+            temperature: Sampling temperature (0.0 to 1.0)
+            max_tokens: Maximum number of tokens to generate
+            model: Model name (see select_model); defaults to the client's model
+            
+        Yields:
+            Text chunks in generation order
+        """
+        async def open_stream():
+            # The slot is held for the whole stream once it opens, but given
+            # back while a failed open backs off
+            await self._async_slots.acquire()
+            try:
+                return await self._get_model(model).generate_content_async(
+                    prompt,
+                    generation_config=self._generation_config(temperature, max_tokens),
+                    stream=True
+                )
+            except BaseException:
+                self._async_slots.release()
+                raise
+        
+        try:
+            # Errors surface when the stream is opened, before any chunk has
+            # been yielded, so only the open call is retried
+            response = await self._acall_with_retry(open_stream)
+            try:
+                async for chunk in response:
+                    yield chunk.text
+            finally:
+                self._async_slots.release()
+        
+        except Exception as e:
+            raise self._translate_error(e)
+    
+    def _generation_config(self, temperature: float, max_tokens: int):
+        """Build the generation config shared by sync and async calls."""
+        return genai.types.GenerationConfig(
+            temperature=temperature,
+            max_output_tokens=max_tokens,
+        )
+    
+    def _translate_error(self, e: Exception) -> Exception:
+        """Map a raw SDK exception to a user-facing error."""
+        error_msg = str(e).lower()
+        if "connection" in error_msg or "network" in error_msg:
+            return ConnectionError(f"🌐 Network error: Cannot connect to Gemini API. Check your internet connection.")
+        elif "api key" in error_msg or "authentication" in error_msg or "401" in error_msg:
+            return ValueError(f"🔑 API Key error: Invalid or expired API key. Get a new one from https://makersuite.google.com/app/apikey")
+        elif "rate limit" in error_msg or "429" in error_msg or "quota" in error_msg:
+            return ConnectionError(f"⏱️ Rate limit: Too many requests. Wait a moment and try again.")
+        else:
+            print(f"Error generating text: {e}")
+            return Exception(f"API Error: {e}")
+    
+    def generate_text_batch(self, prompts: list[str], temperature: float = 0.7, max_tokens: int = 1024,
+                            model: Optional[str] = None) -> list[str]:
         """
         Generate text for multiple prompts with identical settings.
+        Requests run in parallel threads (up to MAX_CONCURRENCY at a time),
+        so the batch takes about as long as its slowest call.
         
         Args:
             prompts: List of input prompts
             temperature: Sampling temperature
             max_tokens: Maximum tokens per response
+            model: Model name (see select_model); defaults to the client's model
             
         Returns:
-            List of generated responses
+            List of generated responses, in prompt order
         """
-        responses = []
-        for prompt in prompts:
-            response = self.generate_text(prompt, temperature, max_tokens)
-            responses.append(response)
+        if not prompts:
+            return []
         
-        return responses
+        with ThreadPoolExecutor(max_workers=min(MAX_CONCURRENCY, len(prompts))) as executor:
+            futures = [
+                executor.submit(self.generate_text, prompt, temperature, max_tokens, model)
+                for prompt in prompts
+            ]
+            return [future.result() for future in futures]
+
+
+_default_client: Optional[GeminiClient] = None
+_default_client_lock = threading.Lock()
+
+
+def get_default_client() -> GeminiClient:
+    """
+    Return the process-wide GeminiClient, creating it on first use.
+    Reads GEMINI_API_KEY from the environment.
+    
+    Returns:
+        Shared GeminiClient instance
+    """
+    global _default_client
+    with _default_client_lock:
+        if _default_client is None:
+            _default_client = GeminiClient()
+    return _default_client
@@ -0,0 +1,379 @@
+"""
+LLM Cache Module
+Caches Gemini-backed results on disk so repeated prompts skip the API calls.
+"""
+
+import asyncio
+import functools
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Callable, List, Optional
+
+try:
+    from sentence_transformers import SentenceTransformer
+except ImportError:  # Semantic tier is optional
+    SentenceTransformer = None
+
+try:
+    import faiss
+except ImportError:  # Falls back to a numpy matmul
+    faiss = None
+
+
+CACHE_DIR = Path(".cache")
+
+# Sampled (temperature > 0) results are only reused for this long, so a
+# cached answer is never frozen in place for good
+SAMPLED_TTL_SECONDS = 24 * 60 * 60
+
+# One cache instance per namespace, so sync and async variants of a method
+# decorated with the same namespace share entries (and the semantic index)
+_exact_caches = {}
+_semantic_caches = {}
+_registry_lock = threading.Lock()
+
+
+class ExactCache:
+    """
+    Exact-match cache: SHA-256 of the key -> JSON file on disk, optionally
+    fronted by an in-process LRU so hot keys skip the file read.
+    Entries older than `ttl` seconds (by write time) count as misses.
+    """
+    
+    def __init__(self, namespace: str, cache_dir: Path = CACHE_DIR, memory_size: int = 0,
+                 ttl: Optional[float] = None):
+        """
+        Initialize the exact cache.
+        
+        Args:
+            namespace: Subdirectory that separates unrelated cached functions
+            cache_dir: Root cache directory (default: ".cache")
+            memory_size: Entries kept in memory (0 disables the memory tier)
+            ttl: Maximum entry age in seconds (None keeps entries forever)
+        """
+        self.cache_dir = Path(cache_dir) / namespace
+        self.memory_size = memory_size
+        self.ttl = ttl
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+    
+    def _path(self, key: str) -> Path:
+        digest = hashlib.sha256(key.encode('utf-8')).hexdigest()
+        return self.cache_dir / f"{digest}.json"
+    
+    def _remember(self, key: str, value: Any, written_at: float) -> None:
+        if not self.memory_size:
+            return
+        with self._lock:
+            self._memory[key] = (value, written_at)
+            self._memory.move_to_end(key)
+            if len(self._memory) > self.memory_size:
+                self._memory.popitem(last=False)
+    
+    def _expired(self, written_at: float) -> bool:
+        return self.ttl is not None and time.time() - written_at > self.ttl
+    
+    def get(self, key: str) -> Optional[Any]:
+        """Return the cached value for key, or None on a miss (or expired entry)."""
+        with self._lock:
+            if key in self._memory:
+                value, written_at = self._memory[key]
+                if not self._expired(written_at):
+                    self._memory.move_to_end(key)
+                    return value
+                del self._memory[key]
+        
+        path = self._path(key)
+        try:
+            written_at = path.stat().st_mtime
+            if self._expired(written_at):
+                return None
+            with open(path, 'r', encoding='utf-8') as f:
+                value = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+        
+        self._remember(key, value, written_at)
+        return value
+    
+    def set(self, key: str, value: Any) -> None:
+        """Store value under key (replacing any older entry)."""
+        self._remember(key, value, time.time())
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        with open(self._path(key), 'w', encoding='utf-8') as f:
+            json.dump(value, f)
+
+
+class ResponseCache:
+    """
+    Per-prompt response cache: in-memory LRU in front of JSON files on disk.
+    Lets a pipeline rerun reuse the response of any prompt it has already
+    seen (typically the unchanged original), even when the batch differs.
+    """
+    
+    def __init__(self, namespace: str = "prompt_responses", memory_size: int = 512,
+                 cache_dir: Path = CACHE_DIR, ttl: Optional[float] = SAMPLED_TTL_SECONDS):
+        """
+        Initialize the response cache.
+        
+        Args:
+            namespace: Cache subdirectory
+            memory_size: Entries kept in memory
+            cache_dir: Root cache directory (default: ".cache")
+            ttl: Maximum response age in seconds (default: SAMPLED_TTL_SECONDS,
+                since responses are sampled); None keeps them forever
+        """
+        self._store = ExactCache(namespace, cache_dir, memory_size=memory_size, ttl=ttl)
+    
+    @staticmethod
+    def key(prompt: str, model: str, temperature: float, max_tokens: int) -> str:
+        """Build the cache key for one generation request."""
+        payload = json.dumps([model, temperature, max_tokens, prompt]).encode('utf-8')
+        return hashlib.blake2b(payload, digest_size=16).hexdigest()
+    
+    def get(self, key: str) -> Optional[str]:
+        """Return the cached response for key, or None on a miss."""
+        return self._store.get(key)
+    
+    def set(self, key: str, response: str) -> None:
+        """Store a response (empty responses are never cached)."""
+        if response:
+            self._store.set(key, response)
+    
+    def get_or_compute(self, key: str, compute: Callable[[], str]) -> str:
+        """Return the cached response for key, computing and storing it on a miss."""
+        response = self.get(key)
+        if response is None:
+            response = compute()
+            self.set(key, response)
+        return response
+
+
+class SemanticCache:
+    """
+    Similarity cache: returns a stored value when a new text embeds close
+    enough (cosine similarity) to a previously seen one.
+    Disabled automatically when sentence-transformers is not installed.
+    Searches a FAISS inner-product index when faiss is installed.
+    
+    Entries live in an append-only JSONL file. Each instance loads only the
+    lines it has not seen yet, so inserts never rewrite the file or rebuild
+    the index, and entries written by other processes are picked up.
+    """
+    
+    MODEL_NAME = "sentence-transformers/all-MiniLM-L6-v2"
+    
+    def __init__(self, namespace: str, threshold: float = 0.95, cache_dir: Path = CACHE_DIR):
+        """
+        Initialize the semantic cache.
+        
+        Args:
+            namespace: Subdirectory that separates unrelated cached functions
+            threshold: Minimum cosine similarity that counts as a hit
+            cache_dir: Root cache directory (default: ".cache")
+        """
+        self.enabled = SentenceTransformer is not None
+        self.threshold = threshold
+        self.index_file = Path(cache_dir) / namespace / "semantic.jsonl"
+        self._model = None
+        self._lock = threading.Lock()
+        self._reset()
+    
+    def _reset(self) -> None:
+        self._entries: List[dict] = []  # scope and value, one per embedding row
+        self._matrix = None  # Preallocated embedding rows (numpy search only)
+        self._index = None
+        self._offset = 0  # Bytes of index_file already loaded
+    
+    def _encode(self, text: str):
+        if self._model is None:
+            self._model = SentenceTransformer(self.MODEL_NAME)
+        return self._model.encode(text, normalize_embeddings=True)
+    
+    def _sync(self) -> None:
+        """Load entries appended to the file since the last sync."""
+        try:
+            with open(self.index_file, 'rb') as f:
+                if f.seek(0, 2) < self._offset:
+                    self._reset()  # The file was replaced or truncated
+                f.seek(self._offset)
+                data = f.read()
+        except FileNotFoundError:
+            return
+        
+        # Only consume complete lines; another writer may be mid-append
+        end = data.rfind(b'\n') + 1
+        if not end:
+            return
+        self._offset += end
+        
+        vectors = []
+        for line in data[:end].splitlines():
+            try:
+                entry = json.loads(line)
+                vectors.append(entry['embedding'])
+                self._entries.append({'scope': entry['scope'], 'value': entry['value']})
+            except (json.JSONDecodeError, KeyError, TypeError):
+                continue
+        
+        if vectors:
+            self._add_vectors(vectors)
+    
+    def _add_vectors(self, vectors: List[List[float]]) -> None:
+        """Append embedding rows to the search structure."""
+        import numpy as np
+        
+        rows = np.array(vectors, dtype=np.float32)
+        
+        if faiss is not None:
+            if self._index is None:
+                self._index = faiss.IndexFlatIP(rows.shape[1])
+            self._index.add(rows)
+            return
+        
+        # Grow the matrix geometrically so appends are amortized O(1) per row
+        count = len(self._entries)
+        start = count - len(rows)
+        if self._matrix is None or count > len(self._matrix):
+            capacity = max(count, 64, 2 * (len(self._matrix) if self._matrix is not None else 0))
+            grown = np.empty((capacity, rows.shape[1]), dtype=np.float32)
+            if start:
+                grown[:start] = self._matrix[:start]
+            self._matrix = grown
+        self._matrix[start:count] = rows
+    
+    def _candidates(self, query):
+        """Yield (similarity, entry index) pairs, most similar first."""
+        import numpy as np
+        
+        if self._index is not None:
+            similarities, ids = self._index.search(query.reshape(1, -1).astype(np.float32), len(self._entries))
+            yield from zip(similarities[0], ids[0])
+            return
+        
+        # One matmul against all cached (normalized) embeddings
+        similarities = self._matrix[:len(self._entries)] @ query
+        for idx in np.argsort(similarities)[::-1]:
+            yield similarities[idx], idx
+    
+    def get(self, text: str, scope: str = "") -> Optional[Any]:
+        """
+        Return the value of the most similar cached text, if similar enough.
+        
+        Args:
+            text: Query text
+            scope: Entries only match within the same scope (e.g. task type)
+        """
+        if not self.enabled:
+            return None
+        
+        with self._lock:
+            self._sync()
+            if not self._entries:
+                return None
+            
+            for similarity, idx in self._candidates(self._encode(text)):
+                if similarity <= self.threshold:
+                    break
+                if self._entries[idx]['scope'] == scope:
+                    return self._entries[idx]['value']
+        return None
+    
+    def set(self, text: str, value: Any, scope: str = "") -> None:
+        """Store value under the embedding of text."""
+        if not self.enabled:
+            return
+        
+        with self._lock:
+            line = json.dumps({
+                'scope': scope,
+                'embedding': self._encode(text).tolist(),
+                'value': value
+            }) + '\n'
+            self.index_file.parent.mkdir(parents=True, exist_ok=True)
+            with open(self.index_file, 'a', encoding='utf-8') as f:
+                f.write(line)
+            # Picks up the new line along with anything other writers appended
+            self._sync()
+
+
+def get_semantic_cache(namespace: str, threshold: float = 0.95) -> SemanticCache:
+    """
+    Return the shared SemanticCache for a namespace, creating it on first use.
+    Sharing one instance keeps a single in-memory index per file.
+    
+    Args:
+        namespace: Cache subdirectory
+        threshold: Minimum cosine similarity that counts as a hit (used on creation)
+    
+    Returns:
+        Shared SemanticCache instance
+    """
+    with _registry_lock:
+        cache = _semantic_caches.get(namespace)
+        if cache is None:
+            cache = _semantic_caches[namespace] = SemanticCache(namespace, threshold)
+    return cache
+
+
+def cached(namespace: str, key_fn: Callable[..., str], semantic_fn: Optional[Callable[..., tuple]] = None,
+           ttl: Optional[float] = None):
+    """
+    Cache a method's result on disk.
+    
+    The wrapped method records whether its last call was served from cache
+    in `self.last_cache_hit`. Works for both sync and async methods.
+    Callers may pass `use_cache=False` to skip the lookup; the fresh result
+    then replaces the cached one.
+    
+    Args:
+        namespace: Cache subdirectory for this method
+        key_fn: Builds the exact-match key from the method's arguments
+        semantic_fn: Optional; returns (text, scope) for the similarity
+            fallback when the exact lookup misses
+        ttl: Maximum entry age in seconds (None keeps entries forever)
+    """
+    exact = _exact_caches.setdefault(namespace, ExactCache(namespace, ttl=ttl))
+    semantic = get_semantic_cache(namespace) if semantic_fn else None
+    
+    def lookup(args, kwargs):
+        value = exact.get(key_fn(*args, **kwargs))
+        if value is None and semantic is not None:
+            value = semantic.get(*semantic_fn(*args, **kwargs))
+        return value
+    
+    def store(args, kwargs, value):
+        if not value:
+            return  # Never cache empty results
+        exact.set(key_fn(*args, **kwargs), value)
+        if semantic is not None:
+            text, scope = semantic_fn(*args, **kwargs)
+            semantic.set(text, value, scope)
+    
+    def decorator(func):
+        if asyncio.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(self, *args, use_cache: bool = True, **kwargs):
+                value = lookup(args, kwargs) if use_cache else None
+                self.last_cache_hit = value is not None
+                if value is None:
+                    value = await func(self, *args, **kwargs)
+                    store(args, kwargs, value)
+                return value
+            return async_wrapper
+        
+        @functools.wraps(func)
+        def wrapper(self, *args, use_cache: bool = True, **kwargs):
+            value = lookup(args, kwargs) if use_cache else None
+            self.last_cache_hit = value is not None
+            if value is None:
+                value = func(self, *args, **kwargs)
+                store(args, kwargs, value)
+            return value
+        return wrapper
+    
+    return decorator
@@ -0,0 +1,259 @@
+"""
+Pipeline Module
+Runs the complete optimization workflow shared by the web app and the debug scripts.
+"""
+
+import queue
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional
+
+from .evaluator import ResponseEvaluator
+from .gemini_client import submit_async
+from .prompt_optimizer import PromptOptimizer
+from .response_generator import ResponseGenerator
+
+
+# Original scores at or above this skip variation generation entirely
+SKIP_THRESHOLD = 90.0
+
+
+def num_variations(user_prompt: str) -> int:
+    """
+    Pick how many variations to generate. Short prompts gain little from
+    extra variations, and each one costs two Gemini calls.
+    """
+    if len(user_prompt) < 40:
+        return 2
+    if len(user_prompt) < 150:
+        return 3
+    return 4
+
+
+def _cache_note(component) -> str:
+    """Suffix for step messages when the step was served from cache."""
+    return " · Cache hit ✓" if getattr(component, 'last_cache_hit', False) else ""
+
+
+class PipelineProgress:
+    """
+    Receives progress events from OptimizationPipeline.
+    All methods are no-ops; front ends override the ones they display.
+    Events are always delivered on the thread that called run().
+    """
+    
+    def step(self, step: int, total: int, message: str) -> None:
+        """A pipeline step started."""
+    
+    def stream_started(self, labels: List[str]) -> None:
+        """Responses for the labelled prompts (only those actually streamed) are about to stream."""
+    
+    def chunk(self, index: int, text: str) -> None:
+        """Prompt `labels[index]` produced more text; `text` is its response so far."""
+    
+    def stream_finished(self) -> None:
+        """All responses of the current stream are complete."""
+
+
+class ConsoleProgress(PipelineProgress):
+    """Prints pipeline steps to stdout (used by the debug scripts)."""
+    
+    def step(self, step: int, total: int, message: str) -> None:
+        print(f"\nSTEP {step}/{total}: {message}")
+
+
+class OptimizationPipeline:
+    """
+    Generates variations, streams and scores their responses, and selects the
+    best prompt. UI concerns are left to a PipelineProgress.
+    """
+    
+    TOTAL_STEPS = 4
+    
+    def __init__(self, optimizer: PromptOptimizer, generator: ResponseGenerator,
+                 evaluator: ResponseEvaluator, skip_threshold: Optional[float] = SKIP_THRESHOLD):
+        """
+        Initialize the pipeline.
+        
+        Args:
+            optimizer: PromptOptimizer instance
+            generator: ResponseGenerator instance
+            evaluator: ResponseEvaluator instance
+            skip_threshold: Original score at or above which optimization is
+                skipped; None always optimizes
+        """
+        self.optimizer = optimizer
+        self.generator = generator
+        self.evaluator = evaluator
+        self.skip_threshold = skip_threshold
+    
+    def run(self, user_prompt: str, task_type: str, mode: str = "auto",
+            progress: Optional[PipelineProgress] = None, use_cache: bool = True) -> Optional[Dict]:
+        """
+        Execute the complete optimization pipeline.
+        
+        Args:
+            user_prompt: Original user prompt
+            task_type: Selected task type
+            mode: Model routing mode, "auto", "fast" or "best"
+            progress: Receives step and streaming events
+            use_cache: False ignores cached variations and responses, so every
+                run asks Gemini again (fresh results still refresh the cache)
+        
+        Returns:
+            Dictionary with 'best_result', 'evaluation_results', 'variations'
+            and 'skipped', or None if no variations could be generated
+        """
+        progress = progress or PipelineProgress()
+        
+        # Step 1: Generate and score the original response first, so a prompt
+        # that is already good can skip the variation work entirely. Variations
+        # only depend on the prompt, so they are requested in the background
+        # meanwhile and discarded if the original scores high enough.
+        progress.step(1, self.TOTAL_STEPS, "Generating a response for your prompt...")
+        
+        variations_future = submit_async(self.optimizer.agenerate_variations(
+            user_prompt, task_type, num_variations=num_variations(user_prompt), mode=mode,
+            use_cache=use_cache
+        ))
+        
+        evaluation_results = self._stream_and_score(user_prompt, [], task_type, mode, progress,
+                                                    use_cache=use_cache)
+        original_scores = evaluation_results[0]['scores']
+        
+        if self.skip_threshold is not None and original_scores['total_score'] >= self.skip_threshold:
+            variations_future.cancel()
+            
+            return {
+                'best_result': {
+                    'best_prompt': user_prompt,
+                    'best_response': evaluation_results[0]['response'],
+                    'best_scores': original_scores,
+                    'explanation': (
+                        f"Your original prompt already scored {original_scores['total_score']:.1f}/100, "
+                        f"so optimization was skipped."
+                    ),
+                    'all_scores': [original_scores['total_score']]
+                },
+                'evaluation_results': evaluation_results,
+                'variations': [],
+                'skipped': True
+            }
+        
+        # Step 2: Collect the prompt variations requested in step 1
+        progress.step(
+            2, self.TOTAL_STEPS,
+            f"Original scored {original_scores['total_score']:.1f}/100"
+            f"{_cache_note(self.generator)} — waiting for optimized prompt variations..."
+        )
+        
+        variations = variations_future.result()
+        
+        if not variations:
+            return None
+        
+        # Step 3: Generate and evaluate variation responses; each response
+        # is scored as soon as its stream finishes
+        progress.step(
+            3, self.TOTAL_STEPS,
+            f"Generated {len(variations)} optimized prompts"
+            f"{_cache_note(self.optimizer)} — generating and evaluating responses..."
+        )
+        
+        evaluation_results = self._stream_and_score(
+            user_prompt, variations, task_type, mode, progress, original=evaluation_results[0],
+            use_cache=use_cache
+        )
+        
+        # Step 4: Select best prompt
+        progress.step(4, self.TOTAL_STEPS, "Selecting optimal prompt...")
+        
+        return {
+            'best_result': self.evaluator.compare_and_select_best(evaluation_results),
+            'evaluation_results': evaluation_results,
+            'variations': variations,
+            'skipped': False
+        }
+    
+    def _stream_and_score(self, user_prompt: str, variations: List[str], task_type: str, mode: str,
+                          progress: PipelineProgress, original: Optional[Dict] = None,
+                          use_cache: bool = True) -> List[Dict]:
+        """
+        Stream responses and score each one as soon as its stream finishes.
+        
+        Args:
+            user_prompt: Original user prompt
+            variations: Optimized prompt variations (may be empty)
+            task_type: Selected task type
+            mode: Model routing mode
+            progress: Receives streaming events
+            original: Evaluation result for the original prompt, if it was
+                already generated and scored; it is then not streamed again
+            use_cache: False regenerates responses instead of reusing cached ones
+        
+        Returns:
+            List of evaluation results; index 0 is always the original
+        """
+        # Chunks arrive on the background event loop, so they are handed to
+        # the calling thread through a queue; progress callbacks only run here.
+        prompts = [user_prompt] + variations
+        labels = ["Original"] + [f"Variation {i}" for i in range(1, len(prompts))]
+        
+        # An already-generated original is not streamed again, so it gets no
+        # display slot; progress indices count streamed prompts only
+        first_streamed = 1 if original else 0
+        progress.stream_started(labels[first_streamed:])
+        
+        chunks = queue.Queue()
+        stream_future = submit_async(self.generator.astream_all_responses(
+            user_prompt,
+            variations,
+            on_chunk=lambda idx, text: chunks.put((idx, text)),
+            task_type=task_type,
+            mode=mode,
+            original_response=original['response'] if original else None,
+            use_cache=use_cache
+        ))
+        
+        texts = [""] * len(prompts)
+        score_futures = {}
+        
+        with ThreadPoolExecutor(max_workers=len(prompts)) as executor:
+            while not (stream_future.done() and chunks.empty()):
+                try:
+                    idx, text = chunks.get(timeout=0.1)
+                except queue.Empty:
+                    continue
+                
+                if text is None:
+                    score_futures[idx] = executor.submit(
+                        self.evaluator.evaluate_response, texts[idx], prompts[idx], task_type
+                    )
+                else:
+                    texts[idx] += text
+                    progress.chunk(idx - first_streamed, texts[idx])
+            
+            all_responses = stream_future.result()
+            scored_items = [all_responses['original']] + all_responses['variations']
+            
+            # Cache hits stream nothing, so score any response not yet submitted
+            for idx, item in enumerate(scored_items):
+                if idx not in score_futures and not (idx == 0 and original):
+                    score_futures[idx] = executor.submit(
+                        self.evaluator.evaluate_response, item['response'], item['prompt'], task_type
+                    )
+            
+            # Collect in prompt order so evaluation_results[0] is always the original
+            evaluation_results = [original] if original else []
+            for idx, item in enumerate(scored_items):
+                if idx == 0 and original:
+                    continue
+                evaluation_results.append({
+                    'prompt': item['prompt'],
+                    'response': item['response'],
+                    'scores': score_futures[idx].result(),
+                    'is_original': idx == 0
+                })
+        
+        progress.stream_finished()
+        
+        return evaluation_results
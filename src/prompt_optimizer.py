@@ -3,20 +3,46 @@ Prompt Optimizer Module
 Generates improved variations of user prompts using Gemini.
 """
 
-from .gemini_client import GeminiClient
+import json
+import re
+from typing import Optional
+
+from .gemini_client import GeminiClient, get_default_client
+from .llm_cache import SAMPLED_TTL_SECONDS, cached
+
+
+# "PROMPT 2 / VARIATION 1: ..." lines in a batched reply (bullets and bold tolerated)
+_BATCH_LINE = re.compile(
+    r'^[\s*-]*PROMPT\s+(\d+)\s*/\s*VARIATION\s+(\d+)\s*:[\s*]*(.+)$', re.IGNORECASE | re.MULTILINE
+)
+
+
+# A comma directly before a closing bracket, as in '["a", "b",]'
+_TRAILING_COMMA = re.compile(r',\s*([\]}])')
+
+# Marked variation lines: "VARIATION 1: ..." (bullets and bold tolerated)
+_VARIATION_LINE = re.compile(
+    r'^[\s*#-]*VARIATION\s*(\d+)\s*[:.)][\s*]*["\']?(.+?)["\']?\s*$', re.IGNORECASE | re.MULTILINE
+)
+
+# Bare numbered lines: "1. ...", "2) ..."; only used when no line is marked,
+# since marked variations may contain numbered sub-items of their own
+_NUMBERED_LINE = re.compile(
+    r'^[\s*#-]*(\d+)\s*[:.)][\s*]*["\']?(.+?)["\']?\s*$', re.MULTILINE
+)
 
 
 class PromptOptimizer:
     """Generates optimized prompt variations based on task type."""
     
-    def __init__(self, client: GeminiClient):
+    def __init__(self, client: Optional[GeminiClient] = None):
         """
         Initialize the prompt optimizer.
         
         Args:
-            client: Initialized GeminiClient instance
+            client: Initialized GeminiClient instance (default: the shared client)
         """
-        self.client = client
+        self.client = client or get_default_client()
         
         # Task-specific optimization guidelines
         self.task_guidelines = {
@@ -46,7 +72,8 @@ class PromptOptimizer:
             )
         }
     
-    def generate_variations(self, original_prompt: str, task_type: str, num_variations: int = 4) -> list[str]:
+    def generate_variations(self, original_prompt: str, task_type: str, num_variations: int = 4,
+                            mode: str = "auto", use_cache: bool = True) -> list[str]:
         """
         Generate improved prompt variations.
         
@@ -54,13 +81,148 @@ class PromptOptimizer:
             original_prompt: The user's original prompt
             task_type: Type of task (Question Answering, Summarization, etc.)
             num_variations: Number of variations to generate (default 4)
-            
+            mode: Model routing mode, "auto", "fast" or "best" (see GeminiClient.select_model)
+            use_cache: False asks Gemini again instead of reusing cached variations
+        
         Returns:
             List of improved prompt variations
         """
+        optimization_prompt = self._build_optimization_prompt(original_prompt, task_type, num_variations)
+        model = self.client.select_model(original_prompt, task_type, mode)
+        
+        try:
+            variations = self._request_variations(
+                optimization_prompt, original_prompt, task_type, num_variations, model,
+                use_cache=use_cache
+            )
+            return self._limit_variations(variations, num_variations)
+        
+        except Exception as e:
+            print(f"Error generating variations: {e}")
+            # Fallback: return the original prompt with basic improvements
+            return [self._create_fallback_variation(original_prompt, task_type)]
+    
+    async def agenerate_variations(self, original_prompt: str, task_type: str, num_variations: int = 4,
+                                   mode: str = "auto", use_cache: bool = True) -> list[str]:
+        """
+        Async version of generate_variations, so variations can be requested
+        while other Gemini calls are still in flight.
+        
+        Args:
+            original_prompt: The user's original prompt
+            task_type: Type of task (Question Answering, Summarization, etc.)
+            num_variations: Number of variations to generate (default 4)
+            mode: Model routing mode, "auto", "fast" or "best" (see GeminiClient.select_model)
+            use_cache: False asks Gemini again instead of reusing cached variations
+        
+        Returns:
+            List of improved prompt variations
+        """
+        optimization_prompt = self._build_optimization_prompt(original_prompt, task_type, num_variations)
+        model = self.client.select_model(original_prompt, task_type, mode)
+        
+        try:
+            variations = await self._arequest_variations(
+                optimization_prompt, original_prompt, task_type, num_variations, model,
+                use_cache=use_cache
+            )
+            return self._limit_variations(variations, num_variations)
+        
+        except Exception as e:
+            print(f"Error generating variations: {e}")
+            return [self._create_fallback_variation(original_prompt, task_type)]
+    
+    def generate_variations_batch(self, original_prompts: list[str], task_type: str,
+                                  num_variations: int = 4, mode: str = "auto") -> list[list[str]]:
+        """
+        Generate variations for several prompts with a single Gemini call
+        (batch prompting, Cheng et al. 2023).
+        
+        Prompts missing from the batched reply fall back to generate_variations.
+        
+        Args:
+            original_prompts: The user prompts to optimize
+            task_type: Type of task shared by all prompts
+            num_variations: Number of variations per prompt (default 4)
+            mode: Model routing mode, "auto", "fast" or "best" (see GeminiClient.select_model)
+        
+        Returns:
+            One list of variations per input prompt, in input order
+        """
+        if not original_prompts:
+            return []
+        
+        # The longest prompt decides the tier: if it is simple, all of them are
+        model = self.client.select_model(max(original_prompts, key=len), task_type, mode)
+        batch_prompt = self._build_batch_prompt(original_prompts, task_type, num_variations)
+        
+        try:
+            response = self.client.generate_text(batch_prompt, temperature=0.8, model=model)
+            buckets = self._parse_batch_variations(response, len(original_prompts))
+        except Exception as e:
+            print(f"Error generating batched variations: {e}")
+            buckets = [[] for _ in original_prompts]
+        
+        return [
+            self._limit_variations(variations, num_variations) if variations
+            else self.generate_variations(prompt, task_type, num_variations, mode)
+            for prompt, variations in zip(original_prompts, buckets)
+        ]
+    
+    def _build_batch_prompt(self, original_prompts: list[str], task_type: str, num_variations: int) -> str:
+        """Render one meta-prompt that asks for variations of every prompt."""
         guidelines = self.task_guidelines.get(task_type, "")
+        numbered = "\n".join(f'PROMPT {i}: "{prompt}"' for i, prompt in enumerate(original_prompts, 1))
         
-        optimization_prompt = f"""You are a prompt engineering expert. Your task is to generate {num_variations} improved variations of a user's prompt.
+        return f"""You are a prompt engineering expert. For EACH of the following prompts, generate {num_variations} improved variations.
+
+{numbered}
+
+Task Type: {task_type}
+
+Optimization Guidelines for {task_type}:
+{guidelines}
+
+Requirements:
+1. Generate exactly {num_variations} distinct improved variations per prompt
+2. Each variation should be clear, specific, and well-structured
+3. Maintain the original intent but enhance clarity and specificity
+4. Add appropriate constraints and formatting instructions
+
+Output Format:
+One variation per line, labelled with its prompt and variation number:
+PROMPT 1 / VARIATION 1: ...
+PROMPT 1 / VARIATION 2: ...
+PROMPT 2 / VARIATION 1: ...
+
+Do not include any other text or explanations."""
+    
+    def _parse_batch_variations(self, response: str, num_prompts: int) -> list[list[str]]:
+        """
+        Bucket a batched reply back by prompt.
+        
+        Args:
+            response: Raw text response from Gemini
+            num_prompts: Number of prompts in the batch
+        
+        Returns:
+            One list of variations per prompt (empty where nothing parsed)
+        """
+        buckets = [[] for _ in range(num_prompts)]
+        
+        for match in _BATCH_LINE.finditer(response):
+            index = int(match.group(1)) - 1
+            variation = match.group(3).strip().strip('"\'')
+            if 0 <= index < num_prompts and variation:
+                buckets[index].append(variation)
+        
+        return buckets
+    
+    def _build_optimization_prompt(self, original_prompt: str, task_type: str, num_variations: int) -> str:
+        """Render the meta-prompt that asks Gemini for improved variations."""
+        guidelines = self.task_guidelines.get(task_type, "")
+        
+        return f"""You are a prompt engineering expert. Your task is to generate {num_variations} improved variations of a user's prompt.
 
 Original Prompt: "{original_prompt}"
 
@@ -77,62 +239,137 @@ Requirements:
 5. Each variation should be different from the others
 
 Output Format:
-Provide each variation on a separate line, numbered as:
-VARIATION 1: [improved prompt]
-VARIATION 2: [improved prompt]
-VARIATION 3: [improved prompt]
-VARIATION 4: [improved prompt]
+Return ONLY a JSON array of exactly {num_variations} strings, one improved prompt per element:
+["improved prompt 1", "improved prompt 2", ...]
 
 Do not include any other text or explanations."""
-
-        try:
-            response = self.client.generate_text(optimization_prompt, temperature=0.8)
-            
-            # Parse the variations from the response
-            variations = self._parse_variations(response)
-            
-            # Ensure we have the expected number of variations
-            if len(variations) < num_variations:
-                print(f"Warning: Expected {num_variations} variations, got {len(variations)}")
-            
-            return variations[:num_variations]
+    
+    def _limit_variations(self, variations: list[str], num_variations: int) -> list[str]:
+        """Warn when Gemini returned too few variations and drop any extras."""
+        if len(variations) < num_variations:
+            print(f"Warning: Expected {num_variations} variations, got {len(variations)}")
         
-        except Exception as e:
-            print(f"Error generating variations: {e}")
-            # Fallback: return the original prompt with basic improvements
-            return [self._create_fallback_variation(original_prompt, task_type)]
+        return variations[:num_variations]
     
-    def _parse_variations(self, response: str) -> list[str]:
+    @cached(
+        "variations",
+        key_fn=lambda optimization_prompt, original_prompt, task_type, num_variations, model:
+            f"{model}|{task_type}|{num_variations}|{original_prompt}",
+        ttl=SAMPLED_TTL_SECONDS
+    )
+    def _request_variations(self, optimization_prompt: str, original_prompt: str,
+                            task_type: str, num_variations: int, model: str) -> list[str]:
         """
-        Parse prompt variations from the LLM response.
+        Call Gemini and parse its variations. Cached on disk for
+        SAMPLED_TTL_SECONDS, so repeated prompts skip the API call; pass
+        use_cache=False to regenerate. Only exact prompts match: variations
+        carry their prompt's specifics, so a merely similar prompt must not
+        reuse them.
+        
+        Args:
+            optimization_prompt: Fully rendered meta-prompt sent to Gemini
+            original_prompt: The user's original prompt (cache key)
+            task_type: Task type (cache key)
+            num_variations: Requested variation count (cache key)
+            model: Model name to call (cache key)
+        
+        Returns:
+            List of parsed variations
+        """
+        response = self.client.generate_text(optimization_prompt, temperature=0.8, model=model)
+        
+        # Parse the JSON array; fall back to line-based parsing if the model
+        # ignored the requested format
+        return self._parse_json_variations(response) or self._parse_variations(response)
+    
+    @cached(
+        "variations",
+        key_fn=lambda optimization_prompt, original_prompt, task_type, num_variations, model:
+            f"{model}|{task_type}|{num_variations}|{original_prompt}",
+        ttl=SAMPLED_TTL_SECONDS
+    )
+    async def _arequest_variations(self, optimization_prompt: str, original_prompt: str,
+                                   task_type: str, num_variations: int, model: str) -> list[str]:
+        """Async version of _request_variations; shares the same cache."""
+        response = await self.client.agenerate_text(optimization_prompt, temperature=0.8, model=model)
+        
+        return self._parse_json_variations(response) or self._parse_variations(response)
+    
+    def _parse_json_variations(self, response: str) -> list[str]:
+        """
+        Parse prompt variations from a JSON array response.
         
         Args:
             response: Raw text response from Gemini
+        
+        Returns:
+            List of extracted prompt variations (empty if not valid JSON)
+        """
+        # JSON mode can't be enforced, so the array may be wrapped in a code
+        # fence or follow prose that itself contains brackets ("Note [1]:");
+        # try each '[' in turn until one decodes to a list of prompts
+        decoder = json.JSONDecoder()
+        start = response.find('[')
+        while start != -1:
+            try:
+                data, _ = decoder.raw_decode(response, start)
+            except json.JSONDecodeError:
+                # Models also leave trailing commas, which strict JSON rejects
+                try:
+                    data, _ = decoder.raw_decode(_TRAILING_COMMA.sub(r'\1', response[start:]))
+                except json.JSONDecodeError:
+                    data = None
             
+            variations = self._json_items(data)
+            if variations:
+                return variations
+            start = response.find('[', start + 1)
+        
+        return []
+    
+    def _json_items(self, data) -> list[str]:
+        """
+        Extract prompt strings from a decoded JSON value.
+        
+        Args:
+            data: Decoded JSON value
+        
         Returns:
-            List of extracted prompt variations
+            List of non-empty prompts (empty if data isn't a list of prompts)
         """
+        if not isinstance(data, list):
+            return []
+        
         variations = []
-        lines = response.strip().split('\n')
-        
-        for line in lines:
-            line = line.strip()
-            # Look for patterns like "VARIATION 1:", "1.", "1:", etc.
-            if line and any(marker in line.upper() for marker in ['VARIATION', '1:', '2:', '3:', '4:', '5:']):
-                # Extract the prompt text after the marker
-                for separator in [':', '.']:
-                    if separator in line:
-                        parts = line.split(separator, 1)
-                        if len(parts) > 1:
-                            variation_text = parts[1].strip()
-                            # Remove quotes if present
-                            variation_text = variation_text.strip('"\'')
-                            if variation_text:
-                                variations.append(variation_text)
-                                break
+        for item in data:
+            if isinstance(item, dict):
+                item = item.get('prompt', '')
+            if isinstance(item, str) and item.strip():
+                variations.append(item.strip())
         
         return variations
     
+    def _parse_variations(self, response: str) -> list[str]:
+        """
+        Parse prompt variations from the LLM response.
+        
+        Args:
+            response: Raw text response from Gemini
+        
+        Returns:
+            List of extracted prompt variations
+        """
+        # One scan over the whole response instead of per-line string checks
+        for pattern in (_VARIATION_LINE, _NUMBERED_LINE):
+            variations = [
+                match.group(2).strip()
+                for match in pattern.finditer(response)
+                if match.group(2).strip()
+            ]
+            if variations:
+                return variations
+        return []
+    
     def _create_fallback_variation(self, original_prompt: str, task_type: str) -> str:
         """
         Create a basic improved variation as fallback.
@@ -140,7 +377,7 @@ Do not include any other text or explanations."""
         Args:
             original_prompt: Original user prompt
             task_type: Task type
-            
+        
         Returns:
             A basic improved prompt
         """
@@ -3,7 +3,11 @@ Response Generator Module
 Generates responses for all prompts using identical model settings.
 """
 
-from .gemini_client import GeminiClient
+import asyncio
+from typing import AsyncIterator, Callable, Optional
+
+from .gemini_client import GeminiClient, get_default_client
+from .llm_cache import ResponseCache
 
 
 class ResponseGenerator:
@@ -13,16 +17,40 @@ class ResponseGenerator:
     TEMPERATURE = 0.7
     MAX_TOKENS = 1024
     
-    def __init__(self, client: GeminiClient):
+    def __init__(self, client: Optional[GeminiClient] = None, cache: Optional[ResponseCache] = None):
         """
         Initialize the response generator.
         
         Args:
-            client: Initialized GeminiClient instance
+            client: Initialized GeminiClient instance (default: the shared client)
+            cache: Per-prompt response cache (default: a ResponseCache under .cache/)
         """
-        self.client = client
+        self.client = client or get_default_client()
+        self.cache = cache if cache is not None else ResponseCache()
+        
+        # Whether every response of the last batch came from the cache
+        self.last_cache_hit = False
     
-    def generate_all_responses(self, original_prompt: str, optimized_prompts: list[str]) -> dict:
+    def _response_key(self, prompt: str, model: Optional[str]) -> str:
+        """Per-prompt cache key for a response with the standard settings."""
+        return ResponseCache.key(prompt, model or self.client.model.model_name, self.TEMPERATURE, self.MAX_TOKENS)
+    
+    def _assemble(self, original_prompt: str, optimized_prompts: list[str], responses: list[str]) -> dict:
+        """Pair responses (original first) back up with their prompts."""
+        return {
+            'original': {
+                'prompt': original_prompt,
+                'response': responses[0]
+            },
+            'variations': [
+                {'prompt': prompt, 'response': response}
+                for prompt, response in zip(optimized_prompts, responses[1:])
+            ]
+        }
+    
+    def generate_all_responses(self, original_prompt: str, optimized_prompts: list[str],
+                               task_type: Optional[str] = None, mode: str = "auto",
+                               use_cache: bool = True) -> dict:
         """
         Generate responses for the original prompt and all optimized variations.
         Uses identical model settings for fair comparison.
@@ -30,6 +58,10 @@ class ResponseGenerator:
         Args:
             original_prompt: The user's original prompt
             optimized_prompts: List of optimized prompt variations
+            task_type: Task type, used for model routing
+            mode: Model routing mode (see GeminiClient.select_model)
+            use_cache: False regenerates every response instead of reusing
+                cached ones; fresh responses still replace the cached entries
             
         Returns:
             Dictionary mapping prompt to its response:
@@ -41,40 +73,160 @@ class ResponseGenerator:
                 ]
             }
         """
-        results = {
-            'original': {},
-            'variations': []
-        }
-        
-        # Generate response for original prompt
-        print("Generating response for original prompt...")
-        original_response = self.client.generate_text(
-            original_prompt,
-            temperature=self.TEMPERATURE,
-            max_tokens=self.MAX_TOKENS
-        )
+        # Route once on the original prompt so every response comes from the same model
+        model = self.client.select_model(original_prompt, task_type, mode)
         
-        results['original'] = {
-            'prompt': original_prompt,
-            'response': original_response
-        }
+        # Reuse responses seen before; the rest are independent, so they are
+        # requested in parallel
+        prompts = [original_prompt] + list(optimized_prompts)
+        keys = [self._response_key(prompt, model) for prompt in prompts]
+        responses = [self.cache.get(key) if use_cache else None for key in keys]
+        missing = [idx for idx, response in enumerate(responses) if response is None]
+        self.last_cache_hit = not missing
         
-        # Generate responses for all optimized prompts
-        print(f"Generating responses for {len(optimized_prompts)} optimized prompts...")
-        for idx, prompt in enumerate(optimized_prompts, 1):
-            print(f"  Processing variation {idx}/{len(optimized_prompts)}...")
-            response = self.client.generate_text(
-                prompt,
+        if missing:
+            print(f"Generating responses for {len(missing)} prompts...")
+            fresh = self.client.generate_text_batch(
+                [prompts[idx] for idx in missing],
                 temperature=self.TEMPERATURE,
-                max_tokens=self.MAX_TOKENS
+                max_tokens=self.MAX_TOKENS,
+                model=model
             )
+            for idx, response in zip(missing, fresh):
+                responses[idx] = response
+                self.cache.set(keys[idx], response)
+        
+        return self._assemble(original_prompt, optimized_prompts, responses)
+    
+    async def agenerate_all_responses(self, original_prompt: str, optimized_prompts: list[str],
+                                      task_type: Optional[str] = None, mode: str = "auto",
+                                      use_cache: bool = True) -> dict:
+        """
+        Async version of generate_all_responses.
+        Fires all requests concurrently, so total latency is roughly that of
+        the slowest single call rather than the sum of all calls.
+        
+        Args:
+            original_prompt: The user's original prompt
+            optimized_prompts: List of optimized prompt variations
+            task_type: Task type, used for model routing
+            mode: Model routing mode (see GeminiClient.select_model)
+            use_cache: False regenerates every response (see generate_all_responses)
+            
+        Returns:
+            Same structure as generate_all_responses
+        """
+        prompts = [original_prompt] + list(optimized_prompts)
+        model = self.client.select_model(original_prompt, task_type, mode)
+        misses = []
+        
+        async def respond(prompt: str) -> str:
+            key = self._response_key(prompt, model)
+            response = self.cache.get(key) if use_cache else None
+            if response is None:
+                misses.append(prompt)
+                response = await self.client.agenerate_text(
+                    prompt,
+                    temperature=self.TEMPERATURE,
+                    max_tokens=self.MAX_TOKENS,
+                    model=model
+                )
+                self.cache.set(key, response)
+            return response
+        
+        print(f"Generating responses for {len(prompts)} prompts concurrently...")
+        responses = await asyncio.gather(*(respond(prompt) for prompt in prompts), return_exceptions=True)
+        
+        # Let every call settle first, then surface the first failure
+        for response in responses:
+            if isinstance(response, Exception):
+                raise response
+        
+        self.last_cache_hit = not misses
+        return self._assemble(original_prompt, optimized_prompts, responses)
+    
+    async def astream_response(self, prompt: str, model: Optional[str] = None) -> AsyncIterator[str]:
+        """
+        Stream a single response with standard settings.
+        
+        Args:
+            prompt: The input prompt
+            model: Model name (see GeminiClient.select_model); defaults to the client's model
             
-            results['variations'].append({
-                'prompt': prompt,
-                'response': response
-            })
+        Yields:
+            Response text chunks as they arrive
+        """
+        async for chunk in self.client.astream_text(
+            prompt,
+            temperature=self.TEMPERATURE,
+            max_tokens=self.MAX_TOKENS,
+            model=model
+        ):
+            yield chunk
+    
+    async def astream_all_responses(self, original_prompt: str, optimized_prompts: list[str],
+                                    on_chunk: Callable[[int, str], None],
+                                    task_type: Optional[str] = None, mode: str = "auto",
+                                    original_response: Optional[str] = None,
+                                    use_cache: bool = True) -> dict:
+        """
+        Stream responses for the original prompt and all variations concurrently.
         
-        return results
+        Args:
+            original_prompt: The user's original prompt
+            optimized_prompts: List of optimized prompt variations
+            on_chunk: Called as on_chunk(index, text) for every chunk, where
+                index 0 is the original prompt; called with text=None once
+                that prompt's stream has finished
+            task_type: Task type, used for model routing
+            mode: Model routing mode (see GeminiClient.select_model)
+            original_response: Already-generated response for the original
+                prompt; when given, only the variations are streamed
+            use_cache: False regenerates every response (see generate_all_responses)
+            
+        Returns:
+            Same structure as generate_all_responses
+        """
+        prompts = [original_prompt] + list(optimized_prompts)
+        model = self.client.select_model(original_prompt, task_type, mode)
+        misses = []
+        
+        async def settled(text: str) -> str:
+            return text
+        
+        async def consume(index: int, prompt: str) -> str:
+            # A response seen before is delivered as a single chunk
+            key = self._response_key(prompt, model)
+            text = self.cache.get(key) if use_cache else None
+            if text is None:
+                misses.append(index)
+                parts = []
+                async for chunk in self.astream_response(prompt, model):
+                    parts.append(chunk)
+                    on_chunk(index, chunk)
+                text = "".join(parts)
+                self.cache.set(key, text)
+            else:
+                on_chunk(index, text)
+            on_chunk(index, None)
+            return text
+        
+        responses = await asyncio.gather(
+            *(
+                settled(original_response) if idx == 0 and original_response is not None
+                else consume(idx, prompt)
+                for idx, prompt in enumerate(prompts)
+            ),
+            return_exceptions=True
+        )
+        
+        # Let every stream settle first, then surface the first failure
+        for response in responses:
+            if isinstance(response, Exception):
+                raise response
+        
+        self.last_cache_hit = not misses
+        return self._assemble(original_prompt, optimized_prompts, responses)
     
     def generate_single_response(self, prompt: str) -> str:
         """
@@ -86,8 +238,11 @@ class ResponseGenerator:
         Returns:
             Generated response text
         """
-        return self.client.generate_text(
-            prompt,
-            temperature=self.TEMPERATURE,
-            max_tokens=self.MAX_TOKENS
+        return self.cache.get_or_compute(
+            self._response_key(prompt, None),
+            lambda: self.client.generate_text(
+                prompt,
+                temperature=self.TEMPERATURE,
+                max_tokens=self.MAX_TOKENS
+            )
         )
@@ -1,14 +1,44 @@
 """
 Storage Module
 Handles optional file-based storage of optimization results.
+Results are kept in an append-only JSONL log, with running statistics in a
+small sidecar file so the sidebar never has to rescan the whole history.
 """
 
 import json
+import logging
+import mmap
 import os
+import tempfile
 from datetime import datetime
 from pathlib import Path
-from typing import Dict, List
+from typing import Dict, Iterator, List, Optional
 
+try:
+    import orjson
+except ImportError:  # Falls back to the standard library encoder
+    orjson = None
+
+
+# Saves are a hot path, so they log at DEBUG instead of printing
+logger = logging.getLogger(__name__)
+
+
+def _dumps(obj) -> str:
+    """Serialize one record as a single JSON line (without the newline)."""
+    if orjson is not None:
+        try:
+            return orjson.dumps(obj).decode('utf-8')
+        except TypeError:  # e.g. numpy scalars, which json handles via float
+            pass
+    return json.dumps(obj)
+
+
+def _loads(text):
+    """Parse one JSON document; orjson's decode error subclasses json's."""
+    if orjson is not None:
+        return orjson.loads(text)
+    return json.loads(text)
 
 class ResultStorage:
     """Manages storage of prompt optimization results to local files."""
@@ -23,15 +53,27 @@ class ResultStorage:
         self.storage_dir = Path(storage_dir)
         self.storage_dir.mkdir(exist_ok=True)
         
-        self.results_file = self.storage_dir / "results.json"
+        self.results_file = self.storage_dir / "results.jsonl"
+        self.stats_file = self.storage_dir / "results.stats.json"
+        
+        # Migrate the legacy single-array JSON file, if present
+        legacy_file = self.storage_dir / "results.json"
+        if not self.results_file.exists() and legacy_file.exists():
+            self._migrate_legacy(legacy_file)
         
         # Initialize results file if it doesn't exist
         if not self.results_file.exists():
-            self._save_results([])
+            self.results_file.touch()
+            self._save_stats(self._empty_stats())
+        elif not self._ends_with_newline():
+            # An interrupted append left a partial line; the next append
+            # would be glued onto it, so drop it before writing again
+            self.compact()
     
     def save_optimization_result(self, result: Dict) -> None:
         """
         Save a single optimization result.
+        Appends one line to the log instead of rewriting the whole file.
         
         Args:
             result: Dictionary containing optimization results
@@ -45,20 +87,51 @@ class ResultStorage:
                     'improvement': float
                 }
         """
-        # Load existing results
-        results = self._load_results()
+        self.save_optimization_results([result])
+    
+    def save_optimization_results(self, results: List[Dict]) -> None:
+        """
+        Save several optimization results at once.
+        All lines go out in a single append and the running statistics are
+        updated once, so a burst of saves costs the same I/O as one.
+        
+        Args:
+            results: List of result dictionaries (see save_optimization_result)
+        """
+        if not results:
+            return
         
-        # Add timestamp if not present
-        if 'timestamp' not in result:
-            result['timestamp'] = datetime.now().isoformat()
+        # Add timestamps if not present
+        now = datetime.now().isoformat()
+        for result in results:
+            if 'timestamp' not in result:
+                result['timestamp'] = now
         
-        # Append new result
-        results.append(result)
+        # Append new results
+        blob = ''.join(_dumps(result) + '\n' for result in results).encode('utf-8')
+        with open(self.results_file, 'ab') as f:
+            f.write(blob)
+            f.flush()
+            end = f.tell()
+            stat = os.fstat(f.fileno())
         
-        # Save back to file
-        self._save_results(results)
+        # Fold the new results into the running statistics only if they
+        # described the log exactly as it was before this append; otherwise
+        # another writer got in between (or the log changed underneath), so
+        # recount from the log
+        stats = self._read_stats()
+        if stats is not None and stats.get('log_size') == end - len(blob):
+            for result in results:
+                self._add_to_stats(stats, result)
+            stats['log_size'] = end
+            # A later append by someone else would make this mtime belong to a
+            # bigger log, so leave it unset and let the next load recount
+            stats['log_mtime_ns'] = stat.st_mtime_ns if stat.st_size == end else None
+        else:
+            stats = self._rebuild_stats()
+        self._save_stats(stats)
         
-        print(f"Result saved to {self.results_file}")
+        logger.debug("%d result(s) saved to %s", len(results), self.results_file)
     
     def get_all_results(self) -> List[Dict]:
         """
@@ -79,8 +152,7 @@ class ResultStorage:
         Returns:
             List of matching results
         """
-        all_results = self._load_results()
-        return [r for r in all_results if r.get('task_type') == task_type]
+        return [r for r in self._iter_results() if r.get('task_type') == task_type]
     
     def get_statistics(self) -> Dict:
         """
@@ -93,53 +165,165 @@ class ResultStorage:
                 - task_type_counts: dict
                 - best_improvement: float
         """
-        results = self._load_results()
+        stats = self._load_stats()
         
-        if not results:
-            return {
-                'total_optimizations': 0,
-                'average_improvement': 0.0,
-                'task_type_counts': {},
-                'best_improvement': 0.0
-            }
-        
-        # Calculate statistics
-        improvements = [r.get('improvement', 0) for r in results if 'improvement' in r]
-        task_types = [r.get('task_type', 'Unknown') for r in results]
-        
-        stats = {
-            'total_optimizations': len(results),
-            'average_improvement': sum(improvements) / len(improvements) if improvements else 0.0,
-            'task_type_counts': self._count_task_types(task_types),
-            'best_improvement': max(improvements) if improvements else 0.0
-        }
+        improvement_count = stats['improvement_count']
         
-        return stats
+        return {
+            'total_optimizations': stats['total_optimizations'],
+            'average_improvement': stats['improvement_sum'] / improvement_count if improvement_count else 0.0,
+            'task_type_counts': dict(stats['task_type_counts']),
+            'best_improvement': stats['best_improvement'] if improvement_count else 0.0
+        }
     
     def clear_results(self) -> None:
         """Clear all stored results."""
-        self._save_results([])
+        open(self.results_file, 'w').close()
+        self._save_stats(self._empty_stats())
         print("All results cleared")
     
+    def compact(self) -> None:
+        """
+        Rewrite the log keeping only complete, parseable results.
+        The new log is written to a temporary file and swapped in atomically.
+        """
+        tmp_file = self.results_file.with_suffix('.tmp')
+        with open(tmp_file, 'w', encoding='utf-8') as f:
+            for result in self._iter_results():
+                f.write(_dumps(result) + '\n')
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_file, self.results_file)
+        
+        self._save_stats(self._rebuild_stats())
+    
+    def _ends_with_newline(self) -> bool:
+        """Check whether the log is empty or its last append completed."""
+        with open(self.results_file, 'rb') as f:
+            f.seek(0, os.SEEK_END)
+            if f.tell() == 0:
+                return True
+            f.seek(-1, os.SEEK_END)
+            return f.read(1) == b'\n'
+    
     def _load_results(self) -> List[Dict]:
-        """Load results from JSON file."""
+        """Load all results from the JSONL log."""
+        return list(self._iter_results())
+    
+    def _iter_results(self) -> Iterator[Dict]:
+        """
+        Stream results from the JSONL log, skipping blank or partial lines.
+        The log is memory-mapped and parsed as bytes, so lines are never
+        decoded into intermediate strings.
+        """
         try:
-            with open(self.results_file, 'r') as f:
-                return json.load(f)
+            with open(self.results_file, 'rb') as f:
+                if os.fstat(f.fileno()).st_size == 0:
+                    return
+                with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                    for line in iter(mm.readline, b''):
+                        if not line.strip():
+                            continue
+                        try:
+                            yield _loads(line)
+                        except json.JSONDecodeError:
+                            continue
+        except FileNotFoundError:
+            return
+    
+    def _migrate_legacy(self, legacy_file: Path) -> None:
+        """Convert a legacy results.json array into the JSONL log."""
+        try:
+            with open(legacy_file, 'r') as f:
+                results = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            results = []
+        
+        with open(self.results_file, 'w', encoding='utf-8') as f:
+            for result in results:
+                f.write(_dumps(result) + '\n')
+        
+        self._save_stats(self._rebuild_stats())
+    
+    def _empty_stats(self) -> Dict:
+        """
+        Running statistics for an empty history, stamped with the log's
+        current size and mtime so stale sidecars can be detected.
+        """
+        return {
+            **self._log_signature(),
+            'total_optimizations': 0,
+            'improvement_count': 0,
+            'improvement_sum': 0.0,
+            'best_improvement': None,
+            'task_type_counts': {}
+        }
+    
+    def _add_to_stats(self, stats: Dict, result: Dict) -> None:
+        """Fold one result into the running statistics."""
+        stats['total_optimizations'] += 1
+        
+        if 'improvement' in result:
+            improvement = result.get('improvement', 0)
+            stats['improvement_count'] += 1
+            stats['improvement_sum'] += improvement
+            if stats['best_improvement'] is None or improvement > stats['best_improvement']:
+                stats['best_improvement'] = improvement
+        
+        task_type = result.get('task_type', 'Unknown')
+        stats['task_type_counts'][task_type] = stats['task_type_counts'].get(task_type, 0) + 1
+    
+    def _rebuild_stats(self) -> Dict:
+        """
+        Recompute running statistics from the full log.
+        The log signature is taken before the scan, so results appended
+        during it make the sidecar look stale rather than complete.
+        """
+        stats = self._empty_stats()
+        for result in self._iter_results():
+            self._add_to_stats(stats, result)
+        return stats
+    
+    def _load_stats(self) -> Dict:
+        """
+        Load running statistics, rebuilding them if the sidecar is missing or
+        no longer matches the log (e.g. the log was replaced by a checkout or
+        appended to by another process).
+        """
+        stats = self._read_stats()
+        if stats is not None:
+            signature = self._log_signature()
+            if (stats.get('log_size') == signature['log_size']
+                    and stats.get('log_mtime_ns') == signature['log_mtime_ns']):
+                return stats
+        
+        stats = self._rebuild_stats()
+        self._save_stats(stats)
+        return stats
+    
+    def _read_stats(self) -> Optional[Dict]:
+        """Read the stats sidecar as stored, or None if it is missing or corrupt."""
+        try:
+            with open(self.stats_file, 'r', encoding='utf-8') as f:
+                return _loads(f.read())
         except (FileNotFoundError, json.JSONDecodeError):
-            return []
+            return None
     
-    def _save_results(self, results: List[Dict]) -> None:
-        """Save results to JSON file."""
-        with open(self.results_file, 'w') as f:
-            json.dump(results, f, indent=2)
+    def _log_signature(self) -> Dict:
+        """Size and mtime of the log, used to check the sidecar is current."""
+        try:
+            stat = os.stat(self.results_file)
+        except FileNotFoundError:
+            return {'log_size': 0, 'log_mtime_ns': None}
+        return {'log_size': stat.st_size, 'log_mtime_ns': stat.st_mtime_ns}
     
-    def _count_task_types(self, task_types: List[str]) -> Dict[str, int]:
-        """Count occurrences of each task type."""
-        counts = {}
-        for task_type in task_types:
-            counts[task_type] = counts.get(task_type, 0) + 1
-        return counts
+    def _save_stats(self, stats: Dict) -> None:
+        """Write running statistics atomically so readers never see a partial file."""
+        # A unique temp name per writer, so concurrent savers never share one
+        fd, tmp_file = tempfile.mkstemp(dir=self.storage_dir, suffix='.tmp')
+        with open(fd, 'w', encoding='utf-8') as f:
+            f.write(_dumps(stats))
+        os.replace(tmp_file, self.stats_file)
     
     def export_to_csv(self, output_file: str = None) -> str:
         """
@@ -154,9 +338,10 @@ class ResultStorage:
         if output_file is None:
             output_file = self.storage_dir / "results_export.csv"
         
-        results = self._load_results()
+        results = self._iter_results()
+        first = next(results, None)
         
-        if not results:
+        if first is None:
             print("No results to export")
             return None
         
@@ -166,9 +351,11 @@ class ResultStorage:
         headers = ['timestamp', 'task_type', 'original_prompt', 'optimized_prompt', 
                    'original_score', 'optimized_score', 'improvement']
         
+        # Rows are written as they are read, so only one result is in memory
         with open(output_file, 'w', newline='', encoding='utf-8') as f:
             writer = csv.DictWriter(f, fieldnames=headers, extrasaction='ignore')
             writer.writeheader()
+            writer.writerow(first)
             writer.writerows(results)
         
         print(f"Results exported to {output_file}")
@@ -1,16 +1,16 @@
 """Test with different prompts to verify fix"""
 
-import os
+import asyncio
 from dotenv import load_dotenv
-from src.gemini_client import GeminiClient
+from src.gemini_client import get_default_client, run_async
 from src.prompt_optimizer import PromptOptimizer
 from src.response_generator import ResponseGenerator
 from src.evaluator import ResponseEvaluator
 
 load_dotenv()
 
-api_key = os.getenv('GEMINI_API_KEY')
-client = GeminiClient(api_key)
+# Reuse the process-wide client so the SDK is configured only once
+client = get_default_client()
 optimizer = PromptOptimizer(client)
 generator = ResponseGenerator(client)
 evaluator = ResponseEvaluator()
@@ -21,45 +21,43 @@ test_cases = [
     ("write sorting code", "Code Generation"),
 ]
 
-for test_prompt, task_type in test_cases:
+
+async def generate_case(test_prompt, task_type):
+    """Generate variations and then all responses for one test case."""
+    variations = await optimizer.agenerate_variations(test_prompt, task_type, num_variations=4)
+    return await generator.agenerate_all_responses(test_prompt, variations)
+
+
+async def generate_all_cases():
+    """Run every test case's API calls concurrently; results keep case order."""
+    return await asyncio.gather(*(generate_case(p, t) for p, t in test_cases))
+
+
+# The cases are independent, so their network round-trips overlap and only
+# the scoring and reporting below run one case at a time
+all_case_responses = run_async(generate_all_cases())
+
+for (test_prompt, task_type), all_responses in zip(test_cases, all_case_responses):
     print("=" * 80)
     print(f"Testing: '{test_prompt}' ({task_type})")
     print("=" * 80)
     
-    # Generate variations
-    variations = optimizer.generate_variations(test_prompt, task_type, num_variations=4)
-    
-    # Generate responses
-    all_responses = generator.generate_all_responses(test_prompt, variations)
-    
-    # Evaluate
-    evaluation_results = []
-    
-    original_scores = evaluator.evaluate_response(
-        all_responses['original']['response'],
-        all_responses['original']['prompt'],
-        task_type
-    )
-    
-    evaluation_results.append({
-        'prompt': all_responses['original']['prompt'],
-        'response': all_responses['original']['response'],
-        'scores': original_scores,
-        'is_original': True
-    })
+    # Evaluate all responses in one pass; index 0 is the original
+    scored_items = [all_responses['original']] + all_responses['variations']
+    all_scores = evaluator.evaluate_many([
+        {'response': item['response'], 'prompt': item['prompt'], 'task_type': task_type}
+        for item in scored_items
+    ])
     
-    for var_data in all_responses['variations']:
-        scores = evaluator.evaluate_response(
-            var_data['response'],
-            var_data['prompt'],
-            task_type
-        )
-        evaluation_results.append({
-            'prompt': var_data['prompt'],
-            'response': var_data['response'],
+    evaluation_results = [
+        {
+            'prompt': item['prompt'],
+            'response': item['response'],
             'scores': scores,
-            'is_original': False
-        })
+            'is_original': idx == 0
+        }
+        for idx, (item, scores) in enumerate(zip(scored_items, all_scores))
+    ]
     
     # Select best
     best_result = evaluator.compare_and_select_best(evaluation_results)
@@ -1,16 +1,15 @@
 """Test to see actual scoring behavior"""
 
-import os
 from dotenv import load_dotenv
-from src.gemini_client import GeminiClient
+from src.gemini_client import get_default_client
 from src.prompt_optimizer import PromptOptimizer
 from src.response_generator import ResponseGenerator
 from src.evaluator import ResponseEvaluator
 
 load_dotenv()
 
-api_key = os.getenv('GEMINI_API_KEY')
-client = GeminiClient(api_key)
+# Reuse the process-wide client so the SDK is configured only once
+client = get_default_client()
 optimizer = PromptOptimizer(client)
 generator = ResponseGenerator(client)
 evaluator = ResponseEvaluator()
@@ -54,26 +53,17 @@ print(f"  Structure: {original_scores['structure_score']:.1f}/25")
 print(f"  Alignment: {original_scores['alignment_score']:.1f}/25")
 print(f"  TOTAL: {original_scores['total_score']:.1f}/100")
 
-# Evaluate best variation
-best_var_idx = 0
-best_var_score = 0
-
-for idx, var_data in enumerate(all_responses['variations']):
-    scores = evaluator.evaluate_response(
-        var_data['response'],
-        var_data['prompt'],
-        task_type
-    )
-    if scores['total_score'] > best_var_score:
-        best_var_score = scores['total_score']
-        best_var_idx = idx
+# Evaluate all variations once and keep their scores, so the best one
+# does not have to be scored a second time
+variation_scores = evaluator.evaluate_many([
+    {'response': var_data['response'], 'prompt': var_data['prompt'], 'task_type': task_type}
+    for var_data in all_responses['variations']
+])
 
+# First variation with the highest total wins
+best_var_idx = max(range(len(variation_scores)), key=lambda idx: variation_scores[idx]['total_score'])
 best_var = all_responses['variations'][best_var_idx]
-best_scores = evaluator.evaluate_response(
-    best_var['response'],
-    best_var['prompt'],
-    task_type
-)
+best_scores = variation_scores[best_var_idx]
 
 print("\n" + "="*80)
 print("BEST OPTIMIZED PROMPT SCORING:")
@@ -0,0 +1,118 @@
+"""Test result storage (JSONL log + stats sidecar) without calling API"""
+
+import json
+import sys
+import tempfile
+from pathlib import Path
+
+from src.storage import ResultStorage
+
+failures = 0
+
+
+def check(label, condition):
+    """Print a pass/fail line and count failures."""
+    global failures
+    if condition:
+        print(f"✓ {label}")
+    else:
+        failures += 1
+        print(f"❌ {label}")
+
+
+def make_result(task_type, improvement):
+    return {
+        'original_prompt': f"{task_type} prompt",
+        'best_prompt': f"improved {task_type} prompt",
+        'task_type': task_type,
+        'improvement': improvement
+    }
+
+
+with tempfile.TemporaryDirectory() as tmp:
+    # Migration from the legacy single-array results.json
+    print("="*80)
+    print("MIGRATION FROM results.json")
+    print("="*80)
+    
+    legacy_dir = Path(tmp) / "legacy"
+    legacy_dir.mkdir()
+    legacy = [make_result("Explanation", 10.0), make_result("Coding", 20.0)]
+    (legacy_dir / "results.json").write_text(json.dumps(legacy))
+    
+    storage = ResultStorage(str(legacy_dir))
+    stats = storage.get_statistics()
+    check("log file created", storage.results_file.exists())
+    check("all legacy results migrated", storage.get_all_results() == legacy)
+    check("one JSON object per line", len(storage.results_file.read_text().splitlines()) == 2)
+    check("stats rebuilt from migrated log", stats['total_optimizations'] == 2 and stats['average_improvement'] == 15.0)
+    
+    # A crash mid-append leaves a truncated last line; opening repairs it
+    print("\n" + "="*80)
+    print("TRUNCATED LAST LINE REPAIR")
+    print("="*80)
+    
+    truncated_dir = Path(tmp) / "truncated"
+    storage = ResultStorage(str(truncated_dir))
+    storage.save_optimization_results([make_result("Coding", 5.0), make_result("Coding", 7.0)])
+    with open(storage.results_file, 'a', encoding='utf-8') as f:
+        f.write('{"original_prompt": "half writ')
+    
+    storage = ResultStorage(str(truncated_dir))
+    text = storage.results_file.read_text()
+    check("log ends with a newline after reopening", text.endswith('\n'))
+    check("partial line dropped, complete results kept", len(storage.get_all_results()) == 2)
+    
+    storage.save_optimization_result(make_result("Creative", 9.0))
+    check("next append lands on its own line", len(storage.get_all_results()) == 3)
+    check("stats count the repaired log", storage.get_statistics()['total_optimizations'] == 3)
+    
+    # Another process appending to the log must invalidate the sidecar
+    print("\n" + "="*80)
+    print("STATS SIDECAR INVALIDATION")
+    print("="*80)
+    
+    shared_dir = Path(tmp) / "shared"
+    storage = ResultStorage(str(shared_dir))
+    storage.save_optimization_result(make_result("Analysis", 4.0))
+    check("stats after own save", storage.get_statistics()['total_optimizations'] == 1)
+    
+    with open(storage.results_file, 'a', encoding='utf-8') as f:
+        f.write(json.dumps(make_result("Analysis", 12.0)) + '\n')
+    
+    stats = storage.get_statistics()
+    check("external append picked up", stats['total_optimizations'] == 2)
+    check("best improvement from external append", stats['best_improvement'] == 12.0)
+    
+    storage.save_optimization_result(make_result("Coding", 1.0))
+    stats = storage.get_statistics()
+    check("own save after external append counted once", stats['total_optimizations'] == 3)
+    check("task counts match the log", stats['task_type_counts'] == {'Analysis': 2, 'Coding': 1})
+    
+    (shared_dir / "results.stats.json").write_text("{not json")
+    check("corrupt sidecar rebuilt", storage.get_statistics()['total_optimizations'] == 3)
+    
+    # compact() drops unparseable lines and keeps stats in step
+    print("\n" + "="*80)
+    print("COMPACT")
+    print("="*80)
+    
+    compact_dir = Path(tmp) / "compact"
+    storage = ResultStorage(str(compact_dir))
+    storage.save_optimization_results([make_result("Explanation", 3.0), make_result("Coding", 6.0)])
+    with open(storage.results_file, 'a', encoding='utf-8') as f:
+        f.write('garbage line\n')
+        f.write(json.dumps(make_result("Creative", 9.0)) + '\n')
+    
+    storage.compact()
+    lines = storage.results_file.read_text().splitlines()
+    check("bad line removed", len(lines) == 3 and all(line.startswith('{') for line in lines))
+    check("no temporary file left behind", not list(compact_dir.glob("*.tmp")))
+    stats = storage.get_statistics()
+    check("stats match compacted log", stats['total_optimizations'] == 3 and stats['average_improvement'] == 6.0)
+
+print("\n" + "="*80)
+if failures:
+    print(f"❌ {failures} storage check(s) failed")
+    sys.exit(1)
+print("✓ All storage checks passed")
@@ -6,7 +6,7 @@ Run this after setting up your .env file to test the pipeline.
 import os
 from dotenv import load_dotenv
 
-from src.gemini_client import GeminiClient
+from src.gemini_client import get_default_client
 from src.prompt_optimizer import PromptOptimizer
 from src.response_generator import ResponseGenerator
 from src.evaluator import ResponseEvaluator
@@ -34,7 +34,7 @@ def test_system():
     try:
         # Test 1: Initialize client
         print("\n[Test 1] Initializing Gemini client...")
-        client = GeminiClient(api_key)
+        client = get_default_client()
         print("✅ Client initialized")
         
         # Test 2: Simple generation
@@ -61,32 +61,21 @@ def test_system():
         print("\n[Test 5] Testing evaluator...")
         evaluator = ResponseEvaluator()
         
-        eval_results = []
+        # Score the original and the variation in one pass
+        scored_items = [all_responses['original']] + all_responses['variations']
+        all_scores = evaluator.evaluate_many([
+            {'response': item['response'], 'prompt': item['prompt'], 'task_type': "Explanation"}
+            for item in scored_items
+        ])
         
-        # Evaluate original
-        original_scores = evaluator.evaluate_response(
-            all_responses['original']['response'],
-            all_responses['original']['prompt'],
-            "Explanation"
-        )
-        eval_results.append({
-            'prompt': all_responses['original']['prompt'],
-            'response': all_responses['original']['response'],
-            'scores': original_scores
-        })
-        
-        # Evaluate variation
-        for var_data in all_responses['variations']:
-            scores = evaluator.evaluate_response(
-                var_data['response'],
-                var_data['prompt'],
-                "Explanation"
-            )
-            eval_results.append({
-                'prompt': var_data['prompt'],
-                'response': var_data['response'],
+        eval_results = [
+            {
+                'prompt': item['prompt'],
+                'response': item['response'],
                 'scores': scores
-            })
+            }
+            for item, scores in zip(scored_items, all_scores)
+        ]
         
         print(f"✅ Evaluated {len(eval_results)} responses")
         print(f"   Original score: {eval_results[0]['scores']['total_score']:.1f}/100")